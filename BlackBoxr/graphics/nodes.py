@@ -40,7 +40,8 @@ class NodeBase(QGraphicsItem):
         super(NodeBase, self).__init__(*args, **kwargs)
         self.setAcceptHoverEvents(True)
         self.setFlags(self.flags() | QGraphicsItem.GraphicsItemFlag.ItemIsMovable |
-                      QGraphicsItem.GraphicsItemFlag.ItemIsSelectable | QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges)
+                      QGraphicsItem.GraphicsItemFlag.ItemIsSelectable | QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges |
+                      QGraphicsItem.GraphicsItemFlag.ItemSendsScenePositionChanges)
         self.oldpos = self.scenePos().toPoint()
 
     def boundingRect(self):
@@ -54,13 +55,14 @@ class NodeBase(QGraphicsItem):
         pen.setColor(Qt.black)
         pen.setCapStyle(Qt.RoundCap)
         painter.setPen(pen)
-        body.addRoundedRect(self.boundingRect(), 10, 10)
+        # Outlines are stroked inside boundingRect so partial viewport updates clear them
+        body.addRoundedRect(self.boundingRect().adjusted(0.5, 0.5, -0.5, -0.5), 10, 10)
         painter.fillPath(body, configuration.NodeBackground.color())
         painter.drawPath(body)
 
         if self.isSelected():
             selectionoutline = QPainterPath()
-            selectionoutline.addRoundedRect(self.boundingRect(), 10, 10)
+            selectionoutline.addRoundedRect(self.boundingRect().adjusted(3, 3, -3, -3), 10, 10)
             pen.setColor(configuration.SelectColor)
             pen.setWidth(6)
             painter.setPen(pen)
@@ -82,9 +84,29 @@ class NodeBase(QGraphicsItem):
             ret = QPointF(xV, yV)
 
         else:
+            if change == QGraphicsItem.ItemScenePositionHasChanged:
+                self.refreshTraces()
             ret = super().itemChange(change, value)
         return ret
 
+    def sockets(self) -> list:
+        return [item for item in self.childItems() if isinstance(item, Socket)]
+
+    def refreshTraces(self):
+        '''
+        Brings the traces on this node's sockets up to date, once each even when both ends are here.
+        In a scene with a repaint scheduler they are rebuilt with the next frame.
+        '''
+        traces = {}
+        for socket in self.sockets():
+            traces.update(dict.fromkeys(socket.traces))
+        scheduler = getattr(self.scene(), 'repaints', None)
+        if scheduler is not None:
+            scheduler.requestTraces(traces)
+        else:
+            for trace in traces:
+                trace.refresh()
+
     def mousePressEvent(self, event: QtWidgets.QGraphicsSceneMouseEvent) -> None:
         self.oldpos = self.scenePos().toPoint()
         return super().mousePressEvent(event)
@@ -123,6 +145,11 @@ class DesignNode(NodeBase):
         self.lbl.setText("DL")
         self.proxy.setWidget(self.lbl)
 
+        # Size from the last layout pass, see layout()
+        self.bounds = QRectF()
+        self.proxy.geometryChanged.connect(self.layout)
+        self.layout()
+
         # self.populate()
 
     def populate(self):
@@ -139,7 +166,9 @@ class DesignNode(NodeBase):
         self.scene().searchByUUID(str(self.ownedDL.uuid))  # For searching
 
     def boundingRect(self):
+        return self.bounds
 
+    def layoutSize(self) -> QRectF:
         horizontalUnitSize = Socket.PILLSIZE.height() + DesignNode.MINIMUMSOCKETPADDING*2
         verticalUnitSize = Socket.PILLSIZE.width() + DesignNode.MINIMUMSOCKETPADDING
         # Calculate horizontal Terminal offsets
@@ -153,16 +182,83 @@ class DesignNode(NodeBase):
 
         return QRectF(0, 0, max(width, basesize.width()), max(height, basesize.height()))
 
+    def layout(self):
+        '''
+        Sizes the node and places the label and terminals. Run whenever a terminal list changes or
+        the label resizes, paint relies on it having run.
+        '''
+        size = self.layoutSize()
+        if size != self.bounds:
+            self.prepareGeometryChange()
+            self.bounds = size
+        bounds = self.boundingRect()
+
+        # Calculate horizontal Terminal offsets
+        horizontalUnitSize = Socket.PILLSIZE.height() + DesignNode.MINIMUMSOCKETPADDING*2
+        # Calculate vertical terminal offsets
+        verticalUnitSize = Socket.PILLSIZE.width() + DesignNode.MINIMUMSOCKETPADDING
+
+        # Center Proxy
+        midpoint = QPointF(bounds.width()/2, bounds.height()/2)
+        offset = QPointF(self.proxy.size().width()/2, self.proxy.size().height()/2)
+        self.proxy.setPos(midpoint-offset)
+
+        # Arrange terminals
+        centeringHPoint = bounds.height()/2
+        centeringVPoint = bounds.width()/2
+
+        leftOffset = centeringHPoint - \
+            ((verticalUnitSize * len(self.leftTerminals))/2) + \
+            Socket.PILLSIZE.height()*2
+        rightOffset = centeringHPoint - \
+            ((verticalUnitSize * len(self.rightTerminals))/2) + \
+            Socket.PILLSIZE.height()*2
+        topOffset = centeringVPoint - \
+            ((horizontalUnitSize * len(self.topTerminals))/2) + \
+            Socket.PILLSIZE.width()/2
+        bottomOffset = centeringVPoint - \
+            ((horizontalUnitSize * len(self.bottomTerminals))/2) + \
+            Socket.PILLSIZE.width()/2
+
+        for count, socket in enumerate(self.leftTerminals):
+            socket.setPos(-Socket.PILLSIZE.width()/2,
+                          leftOffset+count*verticalUnitSize)
+
+        for count, socket in enumerate(self.rightTerminals):
+            socket.setPos(bounds.width()-Socket.PILLSIZE.width()/2,
+                          rightOffset+count*verticalUnitSize)
+
+        for count, socket in enumerate(self.topTerminals):
+            socket.setPos(topOffset+count*horizontalUnitSize, -
+                          Socket.PILLSIZE.height()*1.8)
+
+        for count, socket in enumerate(self.bottomTerminals):
+            socket.setPos(bottomOffset+count*horizontalUnitSize,
+                          bounds.height()-Socket.PILLSIZE.height()*1.8)  # 1.8 fudge factor?
+        self.update()
+
+    def previewZone(self):
+        # The terminal list holding the preview socket, or None
+        for terminalList in [self.leftTerminals, self.rightTerminals, self.topTerminals, self.bottomTerminals]:
+            if self.previewSocket in terminalList:
+                return terminalList
+        return None
+
     def hoverMoveEvent(self, event: QtWidgets.QGraphicsSceneHoverEvent) -> None:
-        self.removePreviewSocket()
         zone = self.determineClosestTerminalZone(event.pos())
+        current = self.previewZone()
+        if current is not None and zone is not None and zone[0] is current:
+            # Still over the same side, nothing to lay out again
+            return
+        self.removePreviewSocket(relayout=zone is None)
         if not isinstance(zone, NoneType):
             self.previewSocket.setParentItem(self)
-            self.previewSocket.vertical = zone[1]
+            self.previewSocket.setVertical(zone[1])
             zone[0].append(self.previewSocket)
             self.previewSocket.spriteOpacity = (255/2)
+            self.previewSocket.update()
             self.previewActive = True
-            self.update()
+            self.layout()
 
     def hoverLeaveEvent(self, event):
         super().hoverLeaveEvent(event)
@@ -177,18 +273,21 @@ class DesignNode(NodeBase):
             dl = DesignElement(self.ownedDL.owningSystem)
             sock = Socket(self, dl, vertical=socketzone[1], preview=False)
             socketzone[0].append(sock)
+            self.layout()
             return sock
         else:
             return None
 
-    def removePreviewSocket(self):
+    def removePreviewSocket(self, relayout=True):
         # Remove preview socket from all terminal lists
-        [terminalList.remove(self.previewSocket) if self.previewSocket in terminalList else None for terminalList in [
-            self.leftTerminals, self.rightTerminals, self.topTerminals, self.bottomTerminals]]
+        current = self.previewZone()
+        if current is not None:
+            current.remove(self.previewSocket)
         self.previewSocket.setParentItem(None)
         self.previewSocket.spriteOpacity = 0
         self.previewActive = False
-        self.update()
+        if current is not None and relayout:
+            self.layout()
 
     def determineClosestTerminalZone(self, inpos) -> typing.Union[tuple[list, bool], NoneType]:
         bounds = self.boundingRect()
@@ -223,50 +322,6 @@ class DesignNode(NodeBase):
 
     def paint(self, painter: QPainter, option, widget):
         super().paint(painter, option, widget)
-        # Calculate horizontal Terminal offsets
-        horizontalUnitSize = Socket.PILLSIZE.height() + DesignNode.MINIMUMSOCKETPADDING*2
-        # Calculate vertical terminal offsets
-        verticalUnitSize = Socket.PILLSIZE.width() + DesignNode.MINIMUMSOCKETPADDING
-
-        # Center Proxy
-        midpoint = QPointF(self.boundingRect().width()/2,
-                           self.boundingRect().height()/2)
-        offset = QPointF(self.proxy.boundingRect().width()/2,
-                         self.proxy.boundingRect().height()/2)
-        self.proxy.setPos(midpoint-offset)
-
-        # Arrange terminals
-        centeringHPoint = self.boundingRect().height()/2
-        centeringVPoint = self.boundingRect().width()/2
-
-        leftOffset = centeringHPoint - \
-            ((verticalUnitSize * len(self.leftTerminals))/2) + \
-            Socket.PILLSIZE.height()*2
-        rightOffset = centeringHPoint - \
-            ((verticalUnitSize * len(self.rightTerminals))/2) + \
-            Socket.PILLSIZE.height()*2
-        topOffset = centeringVPoint - \
-            ((horizontalUnitSize * len(self.topTerminals))/2) + \
-            Socket.PILLSIZE.width()/2
-        bottomOffset = centeringVPoint - \
-            ((horizontalUnitSize * len(self.bottomTerminals))/2) + \
-            Socket.PILLSIZE.width()/2
-
-        for count, socket in enumerate(self.leftTerminals):
-            socket.setPos(-Socket.PILLSIZE.width()/2,
-                          leftOffset+count*verticalUnitSize)
-
-        for count, socket in enumerate(self.rightTerminals):
-            socket.setPos(self.boundingRect().width(
-            )-Socket.PILLSIZE.width()/2, rightOffset+count*verticalUnitSize)
-
-        for count, socket in enumerate(self.topTerminals):
-            socket.setPos(topOffset+count*horizontalUnitSize, -
-                          Socket.PILLSIZE.height()*1.8)
-
-        for count, socket in enumerate(self.bottomTerminals):
-            socket.setPos(bottomOffset+count*horizontalUnitSize, self.boundingRect(
-            ).height()-Socket.PILLSIZE.height()*1.8)  # 1.8 fudge factor?
 
 
 class RequirementNode(NodeBase):
@@ -287,17 +342,31 @@ class RequirementNode(NodeBase):
 
         self.moveFinishedNotifier = None
 
+        # Size of the label as of the last layout pass
+        self.bounds = QRectF()
+        self.proxy.geometryChanged.connect(self.layout)
+        self.layout()
+
     def onRLUpdate(self):
         self.lbl
 
     def boundingRect(self):
+        return self.bounds
+
+    def layout(self):
+        ''' Fits the node to its label and places the sockets, run whenever the label resizes '''
         proxysize = self.proxy.size()
-        return QRectF(0, 0, proxysize.width(), proxysize.height())
+        size = QRectF(0, 0, proxysize.width(), proxysize.height())
+        if size != self.bounds:
+            self.prepareGeometryChange()
+            self.bounds = size
+        self.bottomSocket.setPos(
+            (size.width()/2)-(Socket.PILLSIZE.width()/2), size.height())
+        self.topSocket.setPos(
+            (size.width()/2)-(Socket.PILLSIZE.width()/2), -Socket.PILLSIZE.width())
 
     def paint(self, painter : QPainter, option, widget):
         super().paint(painter, option, widget)
-        bbox = self.boundingRect()
-        # (self.boundingRect().width()/2)-(Socket.PILLSIZE.width()/2)
 
         painter.setBrush(configuration.NodeZoomedColor.color())
         pen = painter.pen()
@@ -307,23 +376,8 @@ class RequirementNode(NodeBase):
         font = QFont('arial', 24)
         font.setHintingPreference(QFont.PreferNoHinting)
         painter.setFont(font)
-        painter.drawText(self.boundingRect(), Qt.AlignCenter ,self.ownedRL.public['Requirement'])
+        painter.drawText(self.boundingRect(), Qt.AlignCenter ,RequirementElement.public.peek(self.ownedRL)['Requirement'])
 
-        self.bottomSocket.setPos(
-            (bbox.width()/2)-(Socket.PILLSIZE.width()/2), bbox.height())
-        self.topSocket.setPos(
-            (bbox.width()/2)-(Socket.PILLSIZE.width()/2), -Socket.PILLSIZE.width())
-        
-
-    def itemChange(self, change: QtWidgets.QGraphicsItem.GraphicsItemChange, value: typing.Any) -> typing.Any:
-        if change == QGraphicsItem.ItemPositionChange:
-            self.bottomSocket.flagForRepaint(True)
-            self.topSocket.flagForRepaint(True)
-            self.scene().views()[0].viewport().repaint()
-            self.bottomSocket.flagForRepaint(False)
-            self.topSocket.flagForRepaint(False)
-
-        return super().itemChange(change, value)
 
     def mouseDoubleClickEvent(self, event: QtWidgets.QGraphicsSceneMouseEvent) -> None:
         print(self.ownedRL.toDict())
@@ -336,12 +390,11 @@ class RequirementNode(NodeBase):
         self.topSocket.flagForRepaint()
         self.bottomSocket.flagForRepaint()
         for trace in self.bottomSocket.traces + self.topSocket.traces:
-            trace.directPath()
-            trace.update()
             trace.show()
+        self.refreshTraces()
         if self.moveFinishedNotifier != None:
             self.moveFinishedNotifier()
-        self.scene().update()
+        self.scene().repaints.requestUpdate(self.sceneBoundingRect())
 
     def moveTo(self, pos : QPointF):
         self.anim = QVariantAnimation()
@@ -372,10 +425,11 @@ class RequirementNode(NodeBase):
 
 class ExternalConnections(DesignNode):
     def __init__(self, bbox, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+        # Needed by the first layout pass, run from DesignNode.__init__
         self.boundingbox = bbox
+        super().__init__(*args, **kwargs)
 
-    def boundingRect(self):
+    def layoutSize(self):
         return QRectF(0, 0, self.boundingbox.width(), self.boundingbox.height())
 
     def updatePos(self):
@@ -420,26 +474,39 @@ class Socket(QGraphicsItem):
         socketcolor.setAlpha(self.spriteOpacity)
         pen.setColor(socketcolor)
         painter.setPen(pen)
-        painter.drawRect(self.boundingRect())
+        painter.drawRect(self.pillRect())
 
         if self.isSelected():
             selectionoutline = QPainterPath()
-            selectionoutline.addRoundedRect(self.boundingRect(), 10, 10)
+            selectionoutline.addRoundedRect(self.pillRect(), 10, 10)
             pen.setColor(configuration.SelectColor)
             pen.setWidth(6)
             painter.setPen(pen)
             painter.drawPath(selectionoutline)
 
-        for trace in self.traces:
-            trace.setPos(self.scenePos())
+    def itemChange(self, change: QtWidgets.QGraphicsItem.GraphicsItemChange, value: typing.Any) -> typing.Any:
+        # Moves of the whole node are handled by NodeBase.refreshTraces
+        if change == QGraphicsItem.ItemPositionHasChanged and isinstance(self.parentItem(), NodeBase):
+            self.parentItem().refreshTraces()
+        return super().itemChange(change, value)
 
-    def boundingRect(self):
+    def pillRect(self):
         pos = Socket.PILLSIZE.getCoords()
         if self.vertical:
             return QRectF(pos[0], pos[1], pos[3], pos[2])
         else:
             return QRectF(pos[0], pos[1], pos[2], pos[3])
 
+    def boundingRect(self):
+        # The pill and its selection outline are stroked PILLSIZE.height() wide around pillRect
+        half = Socket.PILLSIZE.height()/2
+        return self.pillRect().adjusted(-half, -half, half, half)
+
+    def setVertical(self, vertical):
+        if vertical != self.vertical:
+            self.prepareGeometryChange()
+            self.vertical = vertical
+
     def mousePressEvent(self, event):
 
         if self.preview:
@@ -456,6 +523,7 @@ class Socket(QGraphicsItem):
                 selectedItem = self.scene().selectedItems()[0]
                 if objects.qapp.keyboardModifiers() == Qt.ControlModifier and isinstance(selectedItem, Socket):
                     self.trace = ArrowItem(source=selectedItem, destination=self, parent=None)
+                    selectedItem.connectTrace(self.trace)
                     self.connectTrace(self.trace)
                     self.trace.setZValue(0)
                     self.trace.setPos(self.scenePos())
@@ -480,6 +548,7 @@ class Socket(QGraphicsItem):
             t = ArrowItem(source=self, destination=targetSocket, parent=None)
             self.scene().addItem(t)
             self.connectTrace(t)
+            targetSocket.connectTrace(t)
             self.parentNode.ownedRL.addDownstream(targetSocket.parentNode.ownedRL)
 
     def connectTrace(self, trace):
@@ -492,9 +561,13 @@ class Socket(QGraphicsItem):
             if isinstance(trace._sourcePoint.parentNode, RequirementNode):
                 trace._sourcePoint.parentNode.ownedRL.removeFromStreams(trace._destinationPoint.parentNode.ownedRL)
             self.traces.remove(trace)
+            # Both ends hold the trace so either moving refreshes it
+            for end in (trace._sourcePoint, trace._destinationPoint):
+                if isinstance(end, Socket) and trace in end.traces:
+                    end.traces.remove(trace)
     
     def disconnectAll(self):
-        for trace in self.traces:
+        for trace in list(self.traces):
             self.disconnectTrace(trace)
 
     def flagForRepaint(self, shouldrepaint = True):
@@ -523,7 +596,7 @@ class Socket(QGraphicsItem):
             item = self.scene().itemAt(event.scenePos(), QTransform())
 
             if isinstance(item, Socket) and item != self and not item.preview and self.compatibleSockets(self, item):
-                self.trace._destinationPoint = item
+                self.trace.setDestination(item)
                 item.connectTrace(self.trace)
                 self.connectTrace(self.trace)
                 self.trace.setZValue(10)
@@ -535,7 +608,7 @@ class Socket(QGraphicsItem):
             elif isinstance(item, DesignNode):
                 socket = item.materializePreview(
                     self.mapToItem(item, event.pos()))
-                self.trace._destinationPoint = socket
+                self.trace.setDestination(socket)
                 socket.connectTrace(self.trace)
                 self.connectTrace(self.trace)
                 self.trace.setZValue(10)
@@ -585,11 +658,10 @@ class Socket(QGraphicsItem):
             self.trace.setPos(self.scenePos())
             self.scene().addItem(self.trace)
             self.setSelected(False)
-        self.trace.prepareGeometryChange()
-        self.trace._destinationPoint = event.pos()
+        self.trace.setDestination(event.pos())
 
     def anchorPoint(self) -> QPointF:
-        boundingrect = self.boundingRect()
+        boundingrect = self.pillRect()
         return QPointF((boundingrect.width() / 2), (boundingrect.height() / 2))
 
 
@@ -602,10 +674,20 @@ class ArrowItem(QtWidgets.QGraphicsPathItem):
 
         self._arrow_height = 5
         self._arrow_width = 4
+        # Set when the path has to be rebuilt even if the endpoints look unchanged
         self.moved = True
+        # Endpoints, in item coordinates, the cached path and arrowhead were built for
+        self.endpoints = None
+        self.arrowhead : QtGui.QPolygonF = None
+        self.bounds = QRectF()
         self.nodePath = []
         self.worker : PathingRunnable = None
         self.threadpool = QThreadPool()
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges)
+        pen = QPen()
+        pen.setWidth(6)
+        self.setPen(pen)
+        self.refresh()
 
 
     def mouseDoubleClickEvent(self, event: QtWidgets.QGraphicsSceneMouseEvent) -> None:
@@ -628,25 +710,33 @@ class ArrowItem(QtWidgets.QGraphicsPathItem):
 
     def setSource(self, point: QtCore.QPointF):
         self._sourcePoint = point
+        self.refresh()
 
     def setDestination(self, point: QtCore.QPointF):
         self._destinationPoint = point
+        self.refresh()
 
     def itemChange(self, change: QtWidgets.QGraphicsItem.GraphicsItemChange, value: typing.Any) -> typing.Any:
         if change == QGraphicsItem.ItemPositionChange:
             self.moved = True
+        elif change == QGraphicsItem.ItemPositionHasChanged:
+            self.refresh()
 
         return super().itemChange(change, value)
 
-    def directPath(self):
+    def endpointPositions(self):
         if isinstance(self._sourcePoint, QGraphicsItem):
             s = self.mapFromParent(self._sourcePoint.scenePos())
         else:
-            s = self._sourcePoint
+            s = QPointF(self._sourcePoint)
         if isinstance(self._destinationPoint, QGraphicsItem):
             d = self.mapFromParent(self._destinationPoint.scenePos())
         else:
-            d = self._destinationPoint
+            d = QPointF(self._destinationPoint)
+        return s, d
+
+    def directPath(self):
+        s, d = self.endpointPositions()
 
         path = QtGui.QPainterPath(s)
         for percentage in (x * 0.1 for x in range(0, 10)):
@@ -803,28 +893,46 @@ class ArrowItem(QtWidgets.QGraphicsPathItem):
     def paint(self, painter: QtGui.QPainter, option, widget=None) -> None:
         painter.setRenderHint(QPainter.Antialiasing)
 
-        pen = painter.pen()
-        pen.setWidth(6)
-        painter.setPen(pen)
+        painter.setPen(self.pen())
         painter.setBrush(QtCore.Qt.NoBrush)
 
+        painter.drawPath(self.path())
+
+        if self.arrowhead is not None:
+            painter.drawPolyline(self.arrowhead)
+
+    def refresh(self):
+        '''
+        Rebuilds the cached path and arrowhead when an endpoint has moved since they were built,
+        or when moved is set. Never called from paint, setPath changes the item's geometry.
+        '''
+        if not self.isVisible():
+            # Rebuilt when shown again
+            self.moved = True
+            return
+        endpoints = self.endpointPositions()
+        if not self.moved and endpoints == self.endpoints:
+            return
+        self.endpoints = endpoints
+        self.moved = False
+
         path = self.directPath()
         #self.pluginPath()
-        #self.directPath()
         #self.smartPath()
-        painter.drawPath(path)
-        self.setPath(path)
 
+        self.prepareGeometryChange()
         # change path.PointAtPercent() value to move arrow on the line
-        triangle_source = self.arrowCalc(path.pointAtPercent(0.5))
-
-        if triangle_source is not None:
-            painter.drawPolyline(triangle_source)
+        self.arrowhead = self.arrowCalc(path.pointAtPercent(0.5))
+        # The arrowhead sits off the path's end, and square caps reach a full pen width past corners
+        bounds = path.controlPointRect()
+        if self.arrowhead is not None:
+            bounds = bounds.united(self.arrowhead.boundingRect())
+        width = self.pen().widthF()
+        self.bounds = bounds.adjusted(-width, -width, width, width)
+        self.setPath(path)
 
-    def refresh(self):
-        self.directPath()
-        #self.smartPath()
-        self.update()
+    def boundingRect(self):
+        return self.bounds
 
 class PathingRunnable(QRunnable):
     def __init__(self, fn, a: QPointF, b: QPointF, searchbounds, mat):
@@ -11,14 +11,14 @@ from PySide6.QtWidgets import (
     QGraphicsItem, QGraphicsScene, QWidgetAction, QGraphicsRectItem, QGraphicsLineItem, QGraphicsPathItem, QGraphicsProxyWidget, QLabel, QApplication, QUndoView, QStatusBar
 )
 from PySide6 import QtCore, QtWidgets
-from PySide6.QtCore import Qt, QRectF, QRect, QPointF, QVariantAnimation, QEasingCurve, QLineF, QPoint, Signal
+from PySide6.QtCore import Qt, QRectF, QRect, QPointF, QVariantAnimation, QEasingCurve, QLineF, QPoint, Signal, QObject, QTimer, QElapsedTimer
 from PySide6 import QtGui
 from PySide6.QtGui import QTransform, QClipboard, QPixmap, QAction, QPainter, QColor, QPen, QBrush, QCursor, QPainterPath, QFont, QFontMetrics, QUndoStack, QKeySequence, QWheelEvent
 import BlackBoxr.graphics.nodes
 
-from BlackBoxr.misc import configuration, objects
+from BlackBoxr.misc import configuration, objects, storage
 from BlackBoxr.misc.Datatypes import MoveCommand, NameEdit, RequirementElement
-from BlackBoxr.utilities import closestPoint, printMatrix, snapToGrid, transpose
+from BlackBoxr.utilities import closestPoint, log, printMatrix, snapToGrid, transpose
 
 from pathfinding.core.diagonal_movement import DiagonalMovement
 from pathfinding.core.grid import Grid
@@ -29,24 +29,94 @@ from igraph import Graph, EdgeSeq, plot
 
 GRIDSIZE = (25, 25)
 ENDOFFSET = -QPointF(25, 25)
+# Shortest time between two repaint flushes, in ms
+FRAMEINTERVAL = 1000 // 60
+
+# configuration.viewportupdate -> how a DiagramViewer redraws
+UPDATEMODES = {
+    'Smart'    : QGraphicsView.SmartViewportUpdate,
+    'Minimal'  : QGraphicsView.MinimalViewportUpdate,
+    'Bounding' : QGraphicsView.BoundingRectViewportUpdate,
+    'Full'     : QGraphicsView.FullViewportUpdate,
+}
+
+class RepaintScheduler(QObject):
+    '''
+    Collects the regions and traces of one scene that need redrawing and flushes them together,
+    at most once per frame. Traces are rebuilt once per flush however often their nodes moved,
+    and regions are drawn with QGraphicsScene.update(rect) instead of a synchronous repaint.
+    '''
+
+    def __init__(self, scene : QGraphicsScene):
+        super().__init__(scene)
+        self.scene = scene
+        self.region = QRectF()
+        self.everything = False
+        # Insertion ordered set of ArrowItems
+        self.traces = {}
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+        self.sinceFlush = QElapsedTimer()
+        self.sinceFlush.start()
+
+    def requestUpdate(self, rect : QRectF = None):
+        ''' Redraws rect, in scene coordinates, on the next frame. Without rect the whole scene is redrawn. '''
+        if rect is None:
+            self.everything = True
+        else:
+            self.region = self.region.united(rect)
+        self.schedule()
+
+    def requestTraces(self, traces):
+        ''' Rebuilds traces on the next frame '''
+        self.traces.update(dict.fromkeys(traces))
+        self.schedule()
+
+    def schedule(self):
+        if not self.timer.isActive():
+            self.timer.start(max(0, FRAMEINTERVAL - self.sinceFlush.elapsed()))
+
+    def flush(self):
+        traces, self.traces = self.traces, {}
+        for trace in traces:
+            # Traces removed since they were requested are skipped
+            if trace.scene() is self.scene:
+                trace.refresh()
+
+        if self.everything:
+            self.scene.update()
+        elif not self.region.isEmpty():
+            self.scene.update(self.region)
+        self.region = QRectF()
+        self.everything = False
+        self.sinceFlush.restart()
 
 
 class DiagramViewer(QGraphicsView):
 
     newVisibleArea = Signal(QRectF)
 
-    def __init__(self, scene: QGraphicsScene, insys = None):
+    def __init__(self, scene: QGraphicsScene, insys = None, updateMode : str = None):
         super(DiagramViewer, self).__init__(scene)
         self._scene = scene
         self.startPos = None
         self.zoomlevel = 0
         self.sys = insys
+        self.savePath = None
         self.setAcceptDrops(True)
 
+        storage.signals().finished.connect(self.onSaved)
+        storage.signals().failed.connect(self.onSaveFailed)
+
         self.setDragMode(QGraphicsView.DragMode.RubberBandDrag)
-        self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
+        self.setUpdateMode(updateMode or configuration.viewportupdate)
+
+    def setUpdateMode(self, mode : str):
+        ''' Switches to one of UPDATEMODES, unknown names fall back to Smart '''
+        self.setViewportUpdateMode(UPDATEMODES.get(mode, QGraphicsView.SmartViewportUpdate))
 
-        
 
     ''' Item Focusing '''
 
@@ -65,8 +135,6 @@ class DiagramViewer(QGraphicsView):
 
     def repaintTraces(self):
         self._scene.requestRepaintTraces()
-        self._scene.update()
-        self.update()
 
     ''' Drag and Drop behavior '''
 
@@ -104,7 +172,6 @@ class DiagramViewer(QGraphicsView):
             super(DiagramViewer, self).wheelEvent(event)
         self.newVisibleArea.emit(self.mapToScene(
             self.viewport().geometry()).boundingRect())
-        self._scene.update()
 
     def keyPressEvent(self, event: QtGui.QKeyEvent) -> None:
         if objects.qapp.keyboardModifiers() == (Qt.ControlModifier | Qt.AltModifier) and event.key() == Qt.Key_F:
@@ -114,9 +181,17 @@ class DiagramViewer(QGraphicsView):
             self._scene.saveItemsForCopy()
             self._scene.saveImageToClipboard(bounds)
         elif objects.qapp.keyboardModifiers() == Qt.ControlModifier and event.key() == Qt.Key_S:
-            self.sys.save()
+            self.savePath = self.sys.saveInBackground()
         return super().keyPressEvent(event)
 
+    def onSaved(self, path):
+        if path == self.savePath:
+            log('Save', f'Saved system to {path}')
+
+    def onSaveFailed(self, path, error):
+        if path == self.savePath:
+            log('Save', f'Could not save system to {path}: {error}')
+
 class DiagramScene(QGraphicsScene):
 
     formatFinished = Signal()
@@ -127,6 +202,7 @@ class DiagramScene(QGraphicsScene):
 
         self._dragged = False
         self.moveditems = 0
+        self.repaints = RepaintScheduler(self)
         # self.setBackgroundBrush(configuration.GridColor)
 
     def set_viewer(self, viewer):
@@ -285,10 +361,9 @@ class RequirementsScene(DiagramScene):
         if self.moveditems == numberofitems:
             self.moveditems = 0
             self.formatFinished.emit()
-            self.views()[0].repaint()
-            self.update()
+            self.repaints.requestUpdate()
             for item in requirementsItems:
-                item.itemChange(QGraphicsItem.GraphicsItemChange.ItemPositionChange, item.scenePos())
+                item.refreshTraces()
             
             
 
@@ -297,8 +372,6 @@ class RequirementsScene(DiagramScene):
         ) if itemiter.__class__.__name__ == 'RequirementNode']
         for node in reqnodes:
             node.repaintTraces()
-        self.update()
-        self.views()[0].repaint()
 
     def createRequirement(self, at : QPointF):
         rl = BlackBoxr.graphics.nodes.RequirementNode(RequirementElement(self.sys))
@@ -306,8 +379,8 @@ class RequirementsScene(DiagramScene):
         rl.setPos(at)
 
 class RequirementsViewer(DiagramViewer):
-    def __init__(self, scene: QGraphicsScene, insys=None, viewpane=None):
-        super().__init__(scene, insys)
+    def __init__(self, scene: QGraphicsScene, insys=None, viewpane=None, updateMode : str = None):
+        super().__init__(scene, insys, updateMode)
         self.reqscene = scene
         self.viewpane = viewpane
 
@@ -15,7 +15,7 @@ from PySide6.QtGui import QAction, QPen, QColor, QPainter, QKeySequence, QUndoSt
 from pip import main
 import BlackBoxr
 from BlackBoxr.graphics.nodes import  DesignNode, NodeBase, RequirementNode, Socket
-from BlackBoxr.mainwindow.dashboard.home import Dashboard, SystemRepresenter
+from BlackBoxr.mainwindow.dashboard.home import Dashboard
 from BlackBoxr.mainwindow.widgets import DesignView, DetachableTabWidget, GlobalSettingsDialog, RequirementsView
 from BlackBoxr.misc import configuration, objects, Datatypes
 
@@ -1,164 +1,199 @@
 
-from datetime import datetime
+import bisect
 import math
 import os
-from types import NoneType
-from PySide6.QtCore import (QCoreApplication, QDate, QDateTime, QLocale,
-    QMetaObject, QObject, QPoint, QRect, QFileSystemWatcher,
-    QSize, QTime, QUrl, Qt, Signal)
+from PySide6.QtCore import (QAbstractListModel, QCoreApplication, QDate, QDateTime, QLocale,
+    QMetaObject, QModelIndex, QObject, QPoint, QRect, QFileSystemWatcher, QRunnable, QThreadPool,
+    QSize, QTime, QTimer, QUrl, Qt, Signal, Slot)
 from PySide6.QtGui import (QBrush, QColor, QConicalGradient, QCursor,
-    QFont, QFontDatabase, QGradient, QIcon, QResizeEvent,
+    QFont, QFontDatabase, QFontMetrics, QGradient, QIcon, QResizeEvent,
     QImage, QKeySequence, QLinearGradient, QPainter, QPaintEvent,
     QPalette, QPixmap, QRadialGradient, QTransform)
-from PySide6.QtWidgets import (QApplication, QHBoxLayout, QLabel, QLayout, QGridLayout, QListWidget, QListWidgetItem, QListView,
-    QPushButton, QSizePolicy, QSpacerItem, QVBoxLayout, QLineEdit,
+from PySide6.QtWidgets import (QAbstractItemView, QApplication, QHBoxLayout, QLabel, QLayout, QGridLayout, QListView,
+    QPushButton, QSizePolicy, QSpacerItem, QStyle, QStyledItemDelegate, QStyleOptionViewItem, QVBoxLayout, QLineEdit,
     QWidget, QTextEdit)
 from BlackBoxr import utilities
-from BlackBoxr.mainwindow.widgets import EditableLabel
 from BlackBoxr.misc import configuration, objects, Datatypes
 from BlackBoxr.misc.Datatypes import System
-from BlackBoxr.utilities import getDuration, searchFilesForUUID
+from BlackBoxr.misc.catalog import Catalog, catalog
+from BlackBoxr.utilities import relativeTime
+
+# Files catalogued per thread pool task. Small, so the first cards show up right away.
+DISCOVERYBATCH = 16
+# Watcher events are collected for this many ms before the directories are rescanned
+RESCANDELAY = 200
+
+def renameSystem(system : System, text : str):
+    ''' Renames system and the file it was read from, or saves it if it has none yet '''
+    system.setName(text)
+    resident = objects.systems.get(system.uuid)
+    if resident is not None and resident is not system:
+        resident.setName(text)
+    file = catalog().pathForUUID(system.uuid)
+    if file is not None:
+        sys = System.loadFromFile(file)
+        # Only loaded to rewrite the file, the resident copy may hold unsaved changes and stays registered
+        objects.systems.discard(sys)
+        if resident is not None:
+            objects.systems.add(resident)
+        sys.setName(text)
+        print(f'Saved system to {sys.save(file)}')
+        del sys
+    else:
+        system.save()
+
+class SystemListModel(QAbstractListModel):
+    '''
+    The systems shown on the dashboard, most recently updated first. Rows hold the header only
+    Systems built from the catalog.
+    '''
+
+    SystemRole  = Qt.UserRole
+    UpdatedRole = Qt.UserRole + 1
 
-class SystemRepresenter(QWidget):
-    def __init__(self, insys : System = None):
-        super().__init__()
-        self.initUI()
-
-        if isinstance(insys, NoneType):
-            insys = System()
-
-        self.represented = insys
-
-        timesince = getDuration(datetime.strptime(insys.updateDate, "%m/%d/%y %H:%M:%S"))
-
-        updatedlabeltext = ""
-
-        updatedlabeltext = "{} seconds ago".format(timesince['seconds']) if timesince['seconds'] > 0 else updatedlabeltext
-        updatedlabeltext = "{} minutes ago".format(timesince['minutes']) if timesince['minutes'] > 1 else updatedlabeltext
-        updatedlabeltext = "{} hours ago".format(timesince['hours']) if timesince['hours'] > 1 else updatedlabeltext
-        updatedlabeltext = "{} days ago".format(timesince['days']) if timesince['days'] > 0 else updatedlabeltext
-
-
-        self.TypeLabel.setText(u"System")
-        self.OptionsButton.setText(u"\u00b7\u00b7\u00b7")
-        self.SystemNameLabel.setText(insys.name)
-        self.LastEditedIcon.setText(u"ico")
-        self.LastEditedLabel.setText(updatedlabeltext)
-
-
-    def initUI(self):
-        self.verticalLayout = QVBoxLayout(self)
-        self.widget_3 = QWidget(self)
-        self.verticalLayout_2 = QVBoxLayout(self.widget_3)
-        self.verticalLayout_2.setContentsMargins(5, 5, 5, 5)
-        self.widget = QWidget(self.widget_3)
-        sizePolicy = QSizePolicy(QSizePolicy.Preferred, QSizePolicy.Fixed)
-        sizePolicy.setHorizontalStretch(0)
-        sizePolicy.setVerticalStretch(0)
-        sizePolicy.setHeightForWidth(self.widget.sizePolicy().hasHeightForWidth())
-        self.widget.setSizePolicy(sizePolicy)
-        self.horizontalLayout = QHBoxLayout(self.widget)
-        self.horizontalLayout.setSpacing(10)
-        self.horizontalLayout.setContentsMargins(0, 0, 0, 0)
-        self.TypeWidget = QWidget(self.widget)
-        self.TypeWidget.setMaximumSize(QSize(200, 16777215))
-        self.verticalLayout_3 = QVBoxLayout(self.TypeWidget)
-        self.verticalLayout_3.setSpacing(0)
-        self.verticalLayout_3.setContentsMargins(0, 0, 0, 0)
-        self.TypeLabel = QLabel(self.TypeWidget)
-        sizePolicy1 = QSizePolicy(QSizePolicy.Preferred, QSizePolicy.Preferred)
-        sizePolicy1.setHorizontalStretch(0)
-        sizePolicy1.setVerticalStretch(0)
-        sizePolicy1.setHeightForWidth(self.TypeLabel.sizePolicy().hasHeightForWidth())
-        self.TypeLabel.setSizePolicy(sizePolicy1)
-        self.TypeLabel.setMinimumSize(QSize(150, 0))
-        self.TypeLabel.setMaximumSize(QSize(400, 16777215))
-        font = QFont()
-        font.setFamilies([u"Arial"])
-        self.TypeLabel.setFont(font)
-
-        self.verticalLayout_3.addWidget(self.TypeLabel)
-
-
-        self.horizontalLayout.addWidget(self.TypeWidget)
-
-        self.horizontalSpacer = QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
-
-        self.horizontalLayout.addItem(self.horizontalSpacer)
-
-        self.OptionsButton = QPushButton(self.widget)
-        sizePolicy2 = QSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
-        sizePolicy2.setHorizontalStretch(0)
-        sizePolicy2.setVerticalStretch(0)
-        sizePolicy2.setHeightForWidth(self.OptionsButton.sizePolicy().hasHeightForWidth())
-        self.OptionsButton.setSizePolicy(sizePolicy2)
-        self.OptionsButton.setMinimumSize(QSize(32, 32))
-        self.OptionsButton.setMaximumSize(QSize(32, 32))
-
-        self.horizontalLayout.addWidget(self.OptionsButton)
-
-
-        self.verticalLayout_2.addWidget(self.widget)
-
-        self.SystemNameLabel = EditableLabel(self.widget_3)
-        self.SystemNameLabel.textChanged.connect(self.renameEvent)
-        font1 = QFont()
-        font1.setFamilies([u"Arial"])
-        font1.setPointSize(14)
-        self.SystemNameLabel.setFont(font1)
-        #self.SystemNameLabel.setAlignment(Qt.AlignCenter)
-
-        self.verticalLayout_2.addWidget(self.SystemNameLabel)
-
-        self.widget_2 = QWidget(self.widget_3)
-        sizePolicy.setHeightForWidth(self.widget_2.sizePolicy().hasHeightForWidth())
-        self.widget_2.setSizePolicy(sizePolicy)
-        self.horizontalLayout_2 = QHBoxLayout(self.widget_2)
-        self.horizontalLayout_2.setContentsMargins(5, 5, 5, 5)
-        self.LastEditedIcon = QLabel(self.widget_2)
-        sizePolicy2.setHeightForWidth(self.LastEditedIcon.sizePolicy().hasHeightForWidth())
-        self.LastEditedIcon.setSizePolicy(sizePolicy2)
-        self.LastEditedIcon.setMinimumSize(QSize(32, 32))
-        self.LastEditedIcon.setMaximumSize(QSize(32, 32))
-
-        self.horizontalLayout_2.addWidget(self.LastEditedIcon)
-
-        self.LastEditedLabel = QLabel(self.widget_2)
-        self.LastEditedLabel.setFont(font)
-
-        self.horizontalLayout_2.addWidget(self.LastEditedLabel)
-
-
-        self.verticalLayout_2.addWidget(self.widget_2)
-
-
-        self.verticalLayout.addWidget(self.widget_3)
-
-
-        self.TypeLabel.setText(u"TextLabel")
-        self.OptionsButton.setText(u"\u00b7\u00b7\u00b7")
-        self.SystemNameLabel.setText(u"TextLabel")
-        self.LastEditedIcon.setText(u"TextLabel")
-        self.LastEditedLabel.setText(u"x days ago")
-
-    def renameEvent(self, text):
-        self.represented.setName(text)
-        file = searchFilesForUUID(objects.getFilesInDataPaths(), str(self.represented.uuid))
-        if file != False:
-            sys = System.loadFromFile(file)
-            sys.setName(text)
-            print(f'Saved system to {sys.save(file)}')
-            del sys
-        else:
-            self.represented.save()
-
-    def paintEvent(self, event: QPaintEvent) -> None:
-        pass
-        '''if not self.paintingActive():
-            painter = QPainter(self)
-            painter.setBrush(configuration.palette.color(configuration.palette.AlternateBase))
-            painter.drawRoundedRect(self.rect().adjusted(0,0,-1,-1), 15, 15)'''
+    def __init__(self, parent = None) -> None:
+        super().__init__(parent)
+        self.systems = []
+        # Negated update time of every row, kept sorted for bisect
+        self.sortKeys = []
+
+    def rowCount(self, parent = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.systems)
+
+    def data(self, index : QModelIndex, role = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        system = self.systems[index.row()]
+        if role in (Qt.DisplayRole, Qt.EditRole, Qt.ToolTipRole):
+            return system.name
+        elif role == SystemListModel.SystemRole:
+            return system
+        elif role == SystemListModel.UpdatedRole:
+            return -self.sortKeys[index.row()]
+        return None
+
+    def flags(self, index : QModelIndex):
+        return super().flags(index) | Qt.ItemIsEditable
+
+    def setData(self, index : QModelIndex, value, role = Qt.EditRole) -> bool:
+        if role != Qt.EditRole or not index.isValid() or not value or value == index.data():
+            return False
+        renameSystem(self.systems[index.row()], value)
+        self.dataChanged.emit(index, index)
+        return True
+
+    def rowOf(self, system : System) -> int:
+        # By identity, two equal-content copies of a system are different rows
+        return next(row for row, shown in enumerate(self.systems) if shown is system)
+
+    def insertSystem(self, system : System) -> int:
+        ''' Inserts system at its sorted position and returns its row '''
+        key = -system.updated
+        row = bisect.bisect_right(self.sortKeys, key)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.sortKeys.insert(row, key)
+        self.systems.insert(row, system)
+        self.endInsertRows()
+        return row
+
+    def replaceSystem(self, row : int, system : System) -> int:
+        ''' Puts a newer header of the system in row in its place, moving it if it sorts elsewhere '''
+        if self.sortKeys[row] != -system.updated:
+            self.removeSystem(row)
+            return self.insertSystem(system)
+        self.systems[row] = system
+        self.dataChanged.emit(self.index(row), self.index(row))
+        return row
+
+    def removeSystem(self, row : int):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.systems[row]
+        del self.sortKeys[row]
+        self.endRemoveRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.systems.clear()
+        self.sortKeys.clear()
+        self.endResetModel()
+
+class SystemCardDelegate(QStyledItemDelegate):
+    '''
+    Paints the dashboard cards straight from the model, so a card costs nothing until it scrolls
+    into view. A line edit is only created for the card being renamed.
+    '''
+
+    CARDSIZE = QSize(200, 200)
+    MARGIN   = 10
 
+    def __init__(self, parent = None) -> None:
+        super().__init__(parent)
+        self.labelFont = QFont()
+        self.labelFont.setFamilies([u"Arial"])
+        self.nameFont = QFont(self.labelFont)
+        self.nameFont.setPointSize(14)
+
+    def sizeHint(self, option, index) -> QSize:
+        return SystemCardDelegate.CARDSIZE
+
+    def nameRect(self, rect : QRect) -> QRect:
+        rect = rect.adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)
+        return QRect(rect.left(), rect.top() + 42, rect.width(), QFontMetrics(self.nameFont).height() + 8)
+
+    def paint(self, painter : QPainter, option : QStyleOptionViewItem, index : QModelIndex):
+        QApplication.style().drawPrimitive(QStyle.PE_PanelItemViewItem, option, painter, option.widget)
+
+        painter.save()
+        rect = option.rect.adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)
+        painter.setPen(option.palette.color(QPalette.HighlightedText if option.state & QStyle.State_Selected else QPalette.Text))
+
+        painter.setFont(self.labelFont)
+        painter.drawText(QRect(rect.left(), rect.top(), rect.width() - 42, 32), Qt.AlignLeft | Qt.AlignVCenter, u"System")
+        painter.drawText(QRect(rect.right() - 31, rect.top(), 32, 32), Qt.AlignCenter, u"···")
+        painter.drawText(QRect(rect.left(), rect.bottom() - 41, 32, 32), Qt.AlignCenter, u"ico")
+        painter.drawText(QRect(rect.left() + 42, rect.bottom() - 41, rect.width() - 42, 32), Qt.AlignLeft | Qt.AlignVCenter,
+                         relativeTime(index.data(SystemListModel.UpdatedRole)))
+
+        painter.setFont(self.nameFont)
+        name = QFontMetrics(self.nameFont).elidedText(index.data(), Qt.ElideRight, rect.width())
+        painter.drawText(self.nameRect(option.rect), Qt.AlignLeft | Qt.AlignVCenter, name)
+        painter.restore()
+
+    def createEditor(self, parent, option, index) -> QWidget:
+        editor = QLineEdit(parent)
+        editor.setFont(self.nameFont)
+        return editor
+
+    def updateEditorGeometry(self, editor, option, index):
+        editor.setGeometry(self.nameRect(option.rect))
+
+class DiscoverySignals(QObject):
+    # pass, catalog entries, paths that are not (or no longer) system files
+    found    = Signal(int, list, list)
+    finished = Signal(int)
+
+class DiscoveryRunnable(QRunnable):
+    ''' Catalogs a batch of files on the thread pool and sends their entries back '''
+
+    def __init__(self, discoveryPass : int, files : list[str], listing : list[str], signals : DiscoverySignals):
+        super().__init__()
+        self.discoveryPass = discoveryPass
+        self.files = files
+        self.listing = listing
+        self.signals = signals
+
+    @Slot()
+    def run(self):
+        found, missing = [], []
+        for path in self.files:
+            catalog().updateFile(path, self.listing)
+            entry = catalog().entry(path)
+            if entry is not None:
+                found.append(entry)
+            else:
+                missing.append(path)
+        self.signals.found.emit(self.discoveryPass, found, missing)
+        self.signals.finished.emit(self.discoveryPass)
 
 class Dashboard(QWidget):
 
@@ -167,34 +202,117 @@ class Dashboard(QWidget):
     def __init__(self, parent = None) -> None:
         super().__init__(parent)
         self.setupUI(parent)
-        self.systemReppers = []
+        # path -> shown System, and path -> (mtime, size) of the file as last read
+        self.cards = {}
+        self.fingerprints = {}
+        # str(uuid) -> System created here, its card is taken over once its file is catalogued
+        self.created = {}
+
+        catalog()
+        self.threadpool = QThreadPool.globalInstance()
+        self.discoveryPass = 0
+        # Not parented, batches still running hold on to it after the dashboard is gone
+        self.discoverySignals = DiscoverySignals()
+        self.discoverySignals.found.connect(self.onSystemsFound)
+        self.discoverySignals.finished.connect(self.onBatchFinished)
         self.discoverSystems()
 
         self.observer = QFileSystemWatcher(self)
         for path in objects.searchdirs:
             self.observer.addPath(path)
-        self.observer.fileChanged.connect(lambda : self.repopulateSystems())
-        self.observer.directoryChanged.connect(lambda : self.repopulateSystems())
+        self.observer.fileChanged.connect(lambda path : self.scheduleRescan(os.path.dirname(path)))
+        self.observer.directoryChanged.connect(self.scheduleRescan)
+        self.rescanDirs = set()
+        self.rescanTimer = QTimer(self)
+        self.rescanTimer.setSingleShot(True)
+        self.rescanTimer.setInterval(RESCANDELAY)
+        self.rescanTimer.timeout.connect(self.rescan)
 
     def repopulateSystems(self):
-        self.systemReppers.clear()
-        self.gridlist.clear()
+        self.cards.clear()
+        self.fingerprints.clear()
+        self.created.clear()
+        self.model.clear()
 
         self.discoverSystems()
 
+    def scheduleRescan(self, directory):
+        ''' Collects the directories of a burst of watcher events and rescans them once it is over '''
+        self.rescanDirs.add(os.path.normpath(os.path.abspath(directory)))
+        self.rescanTimer.start()
+
+    def rescan(self):
+        '''
+        Compares the watched directories with the state the cards were built from by (path, mtime,
+        size). Cards of removed files are dropped at once, new and changed files are read on the
+        thread pool and their cards added or updated when they come back.
+        '''
+        dirs, self.rescanDirs = self.rescanDirs, set()
+        for dir in dirs:
+            try:
+                listing = os.listdir(dir)
+            except FileNotFoundError:
+                listing = []
+            files = {os.path.join(dir, pos_json) for pos_json in listing if pos_json.endswith('.json')}
+            for path in [path for path in self.fingerprints if os.path.dirname(path) == dir and path not in files]:
+                del self.fingerprints[path]
+                self.removeCard(path)
+                catalog().removeFile(path)
+
+            changed = []
+            for path in files:
+                fingerprint = Catalog.fingerprint(path)
+                if fingerprint is not None and self.fingerprints.get(path) != fingerprint:
+                    self.fingerprints[path] = fingerprint
+                    changed.append(path)
+            self.discoveredFiles[dir] = files
+            for i in range(0, len(changed), DISCOVERYBATCH):
+                self.pendingBatches += 1
+                self.threadpool.start(DiscoveryRunnable(self.discoveryPass, changed[i:i + DISCOVERYBATCH], listing, self.discoverySignals))
+
     def discoverSystems(self):
-        
-        files =[]
-        systems = []
+        '''
+        Catalogs the search dirs on the thread pool. Cards are inserted in sorted position as
+        batches come back, results of an earlier pass are ignored.
+        '''
+        self.discoveryPass += 1
+        self.pendingBatches = 0
+        # directory -> files found in it, catalog rows of other files are dropped at the end
+        self.discoveredFiles = {}
         for dir in objects.searchdirs:
-            dir = os.path.normpath(dir)
-            files += [os.path.join(dir, pos_json) for pos_json in os.listdir(dir) if pos_json.endswith('.json')]
-        for file in files:
-            systems.append(System.getDummySystemFromFile(file))
-            systems.sort(key=lambda x: x.deltaSinceUpdate(), reverse=False)
-        for system in systems:
-            self.addWidget(SystemRepresenter(system))
-        
+            dir = os.path.normpath(os.path.abspath(dir))
+            listing = os.listdir(dir)
+            files = [os.path.join(dir, pos_json) for pos_json in listing if pos_json.endswith('.json')]
+            self.discoveredFiles[dir] = set(files)
+            for i in range(0, len(files), DISCOVERYBATCH):
+                self.pendingBatches += 1
+                self.threadpool.start(DiscoveryRunnable(self.discoveryPass, files[i:i + DISCOVERYBATCH], listing, self.discoverySignals))
+
+    def onSystemsFound(self, discoveryPass, entries, missing):
+        if discoveryPass != self.discoveryPass:
+            return
+        for entry in entries:
+            self.fingerprints[entry.path] = (entry.mtime, entry.size)
+            self.updateCard(entry)
+        for path in missing:
+            self.removeCard(path)
+        if self.lineEdit.text():
+            self.filterSystems(self.lineEdit.text())
+
+    def onBatchFinished(self, discoveryPass):
+        if discoveryPass != self.discoveryPass:
+            return
+        self.pendingBatches -= 1
+        if not self.pendingBatches:
+            for dir, files in self.discoveredFiles.items():
+                catalog().prune(dir, files)
+
+    def filterSystems(self, text):
+        ''' Hides the cards of systems whose name does not contain text '''
+        text = text.strip()
+        matches = {entry.uuid for entry in catalog().search(text)}
+        for row, system in enumerate(self.model.systems):
+            self.gridlist.setRowHidden(row, bool(text) and str(system.uuid) not in matches)
 
     def setupUI(self, parent):
         self.setSizePolicy(QSizePolicy(QSizePolicy.Preferred, QSizePolicy.MinimumExpanding))
@@ -235,13 +353,18 @@ class Dashboard(QWidget):
 
         self.verticalLayout.addWidget(self.widget)
 
-        self.gridlist = QListWidget(self)
+        self.model = SystemListModel(self)
+        self.gridlist = QListView(self)
+        self.gridlist.setModel(self.model)
+        self.gridlist.setItemDelegate(SystemCardDelegate(self.gridlist))
         self.verticalLayout.addWidget(self.gridlist)
         self.gridlist.setFlow(QListView.LeftToRight)
         self.gridlist.setProperty("isWrapping", True)
         self.gridlist.setResizeMode(QListView.Adjust)
         self.gridlist.setUniformItemSizes(True)
         self.gridlist.setSpacing(5)
+        # Double clicking opens a system, so names are edited by clicking a selected card or with F2
+        self.gridlist.setEditTriggers(QAbstractItemView.SelectedClicked | QAbstractItemView.EditKeyPressed)
 
         self.verticalLayout.setAlignment(Qt.AlignTop)
 
@@ -250,32 +373,49 @@ class Dashboard(QWidget):
         self.lineEdit.setPlaceholderText(u"Filter")
         self.pushButton.setText(u"Create")
 
-        self.pushButton.clicked.connect(lambda: self.addWidget(SystemRepresenter()))
-        self.gridlist.itemDoubleClicked.connect(self.systemOpened)
+        self.pushButton.clicked.connect(self.createSystem)
+        self.gridlist.doubleClicked.connect(self.systemOpened)
+        self.lineEdit.textChanged.connect(self.filterSystems)
 
-    def systemOpened(self, sysrepper : QListWidgetItem):
-        sysrepper = self.gridlist.itemWidget(sysrepper)
-        
-        file = utilities.searchFilesForUUID(utilities.getFilesWithExtension(objects.searchdirs), str(sysrepper.represented.uuid))
-        if file != False:
+    def systemOpened(self, index : QModelIndex):
+        represented = index.data(SystemListModel.SystemRole)
+
+        # A system already in memory is the current one, it may hold changes not saved yet
+        sys = objects.systems.get(represented.uuid)
+        file = catalog().pathForUUID(represented.uuid) if sys is None else None
+        if file is not None:
+            # Loading registers the system in objects.systems
             sys = System.loadFromFile(file)
-            if sys in objects.systems:
-                objects.systems.remove(sys)
+        if sys is not None:
             print(f"Opened {sys.uuid}")
-            objects.systems.append(sys)
             self.requestSystemOpened.emit(sys)
-            
         else:
-            print(f"ERROR: Could not open system with uuid {str(sysrepper.represented.uuid)}")
+            print(f"ERROR: Could not open system with uuid {str(represented.uuid)}")
         
 
 
-    def addWidget(self, widget : QWidget):
-        self.systemReppers.append(widget)
-        itemProxy = QListWidgetItem()
-        itemProxy.setSizeHint(QSize(200, 200))
-        self.gridlist.addItem(itemProxy)
-        self.gridlist.setItemWidget(itemProxy, widget)
+    def createSystem(self):
+        system = System()
+        self.created[str(system.uuid)] = system
+        self.model.insertSystem(system)
+
+    def updateCard(self, entry):
+        '''
+        Adds the card for a catalog entry, or refreshes the one already shown for its file or for
+        the created system it holds
+        '''
+        system = System.fromHeader(entry._asdict())
+        shown = self.cards.get(entry.path) or self.created.pop(entry.uuid, None)
+        if shown is not None:
+            self.model.replaceSystem(self.model.rowOf(shown), system)
+        else:
+            self.model.insertSystem(system)
+        self.cards[entry.path] = system
+
+    def removeCard(self, path):
+        shown = self.cards.pop(path, None)
+        if shown is not None:
+            self.model.removeSystem(self.model.rowOf(shown))
 
     def resizeEvent(self, event: QResizeEvent) -> None:
         self.gridlist.resizeEvent(event)
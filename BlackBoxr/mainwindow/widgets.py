@@ -7,13 +7,13 @@ from PySide6.QtGui import QFont, QFontMetrics, QTextCursor, QPainter, QPen, QPai
 from PySide6.QtCore import Signal, Slot, QRect, QSize, Qt
 from PySide6 import QtCore, QtGui, QtWidgets
 from BlackBoxr import utilities
-from BlackBoxr.graphics.viewer import DiagramScene, DiagramViewer, RequirementsScene, RequirementsViewer
+from BlackBoxr.graphics.viewer import UPDATEMODES, DiagramScene, DiagramViewer, RequirementsScene, RequirementsViewer
 
 from BlackBoxr.misc import configuration, objects
 from PySide6.QtCharts import QChart, QChartView, QPieSeries
 import qdarktheme
 
-from BlackBoxr.misc.Datatypes import DesignElement, Element, System
+from BlackBoxr.misc.Datatypes import DesignElement, Element, RequirementElement, System, SystemChange
 
 bold = QFont("Verdana", 16)
 bold.setBold(True)
@@ -673,6 +673,29 @@ class GlobalSettingsDialog(QDialog):
 
         self.gridLayout.addWidget(self.copystyleSelectBox, 2, 1, 1, 1)
 
+        self.savemodelabel = QLabel(self.scrollAreaWidgetContents)
+        self.savemodelabel.setObjectName(u"label_7")
+
+        self.gridLayout.addWidget(self.savemodelabel, 3, 0, 1, 1)
+
+        self.savemodeSelectBox = QComboBox(self.scrollAreaWidgetContents)
+        self.savemodeSelectBox.addItem("")
+        self.savemodeSelectBox.addItem("")
+        self.savemodeSelectBox.setObjectName(u"savemodeSelectBox")
+
+        self.gridLayout.addWidget(self.savemodeSelectBox, 3, 1, 1, 1)
+
+        self.viewportupdatelabel = QLabel(self.scrollAreaWidgetContents)
+        self.viewportupdatelabel.setObjectName(u"label_8")
+
+        self.gridLayout.addWidget(self.viewportupdatelabel, 4, 0, 1, 1)
+
+        self.viewportupdateSelectBox = QComboBox(self.scrollAreaWidgetContents)
+        self.viewportupdateSelectBox.addItems(list(UPDATEMODES))
+        self.viewportupdateSelectBox.setObjectName(u"viewportupdateSelectBox")
+
+        self.gridLayout.addWidget(self.viewportupdateSelectBox, 4, 1, 1, 1)
+
         self.verticalLayout_2.addLayout(self.gridLayout)
 
         self.fontsettingslabel = QLabel(self.scrollAreaWidgetContents)
@@ -739,6 +762,12 @@ class GlobalSettingsDialog(QDialog):
         self.copystyleSelectBox.setItemText(1, u"Duplicate")
         self.copystyleSelectBox.setItemText(2, u"Reference")
 
+        self.savemodelabel.setText(u"Save Mode")
+        self.savemodeSelectBox.setItemText(0, u"Full")
+        self.savemodeSelectBox.setItemText(1, u"Journal")
+
+        self.viewportupdatelabel.setText(u"Canvas Updates")
+
         self.scrollAreaWidgetContents.resize(self.scrollArea.minimumSizeHint())
         self.scrollArea.resize(self.scrollArea.minimumSizeHint())
         self.loadSettings()
@@ -747,6 +776,8 @@ class GlobalSettingsDialog(QDialog):
         self.appThemeSelectBox.setCurrentIndex(self.appThemeSelectBox.findText(configuration.themename))
         self.namingStyleSelectBox.setCurrentIndex(self.namingStyleSelectBox.findText(configuration.namingstyle))
         self.copystyleSelectBox.setCurrentIndex(self.copystyleSelectBox.findText(configuration.copypreference))
+        self.savemodeSelectBox.setCurrentIndex(self.savemodeSelectBox.findText(configuration.savemode))
+        self.viewportupdateSelectBox.setCurrentIndex(self.viewportupdateSelectBox.findText(configuration.viewportupdate))
 
     def saveSettings(self):
         configuration.globalSettingsSizeX = self.size().width()
@@ -758,6 +789,8 @@ class GlobalSettingsDialog(QDialog):
         configuration.themename = self.appThemeSelectBox.currentText()
         configuration.namingstyle = self.namingStyleSelectBox.currentText()
         configuration.copypreference = self.copystyleSelectBox.currentText()
+        configuration.savemode = self.savemodeSelectBox.currentText()
+        configuration.viewportupdate = self.viewportupdateSelectBox.currentText()
         self.saveSettings()
 
     def reject(self) -> None:
@@ -915,6 +948,7 @@ class DesignView(GenericCanvasView):
 
     def __init__(self, source, parent: Optional[QtWidgets.QWidget]) -> None:
         super().__init__(source, parent)
+        objects.systems.pin(source, self)
         self.Scene.setSceneRect(0,0,50000,50000)
         self.Viewer.centerOn(25000, 25000)
         self.populateTree()
@@ -950,11 +984,24 @@ class RequirementsView(QMainWindow):
         self.Viewer : DiagramViewer = RequirementsViewer(self.Scene, source, self)
         self.source = source
         self.source.subscribe(self.onSystemUpdate)
+        objects.systems.pin(source, self)
         self.setupui()
         self.repopulateTree()
 
-    def onSystemUpdate(self):
-        self.repopulateTree()
+    def onSystemUpdate(self, changes : SystemChange):
+        # Only the affected rows are touched, a bulk import no longer rebuilds the tree per element
+        for uuid in changes.removed:
+            item = self.requirementItems.pop(uuid, None)
+            if item is not None:
+                self.toplevelDLs.removeChild(item)
+        for uuid in changes.added:
+            requirement = self.source.searchByUUID(uuid)
+            if isinstance(requirement, RequirementElement):
+                self.addRequirementItem(requirement)
+        for uuid in changes.modified:
+            item = self.requirementItems.get(uuid)
+            if item is not None:
+                item.setText(0, self.source.searchByUUID(uuid).public['Name'])
 
     def repopulateTree(self):
         self.ElementTree.clear()
@@ -966,11 +1013,9 @@ class RequirementsView(QMainWindow):
         self.ElementTree.addTopLevelItem(self.toplevelSystems)
 
         # Populate Requirements
+        self.requirementItems = {}
         for requirement in self.source.RL:
-            inrl = QTreeWidgetItem(self.toplevelDLs)
-            # TODO: Make this configurable
-            inrl.setText(0, requirement.public['Name'])
-            inrl.setData(1, 0, str(requirement.uuid))
+            self.addRequirementItem(requirement)
 
         # Populate Systems
         '''for system in objects.systems:
@@ -978,6 +1023,13 @@ class RequirementsView(QMainWindow):
             sysItem = QTreeWidgetItem(self.toplevelSystems)
             sysItem.setText(0, system.name)'''
 
+    def addRequirementItem(self, requirement : RequirementElement):
+        inrl = QTreeWidgetItem(self.toplevelDLs)
+        # TODO: Make this configurable
+        inrl.setText(0, requirement.public['Name'])
+        inrl.setData(1, 0, str(requirement.uuid))
+        self.requirementItems[str(requirement.uuid)] = inrl
+
     def renameItem(self, searchText, newText):
         '''print(f'Searching for {searchText}')
         print(self.ElementTree.findItems(searchText, Qt.MatchCaseSensitive, 0))#[0].setText(0, newText)
@@ -1069,6 +1121,7 @@ class DisplayItem(QWidget):
     def itemChanged(self, key, value):
         prevpublic = copy.deepcopy(self.ownedItem.public)
         self.ownedItem.public[key] = value
+        self.ownedItem.touch()
         self.graphicsProxyWidget().scene().viewpane.renameItem(prevpublic[key], value)
         #print(utilities.diffdict(prevpublic, self.ownedItem.public))
 
@@ -1,7 +1,10 @@
 from abc import abstractmethod
+from contextlib import contextmanager, nullcontext
 import copy
 from enum import Enum
+import hashlib
 import os
+from sys import intern
 import time
 from types import NoneType
 from typing import Type
@@ -15,71 +18,477 @@ from PySide6.QtWidgets import (
     QGraphicsItem, QGraphicsScene
 )
 from PySide6.QtGui import QUndoCommand
-from PySide6.QtCore import QPointF
-from datetime import datetime
+from PySide6.QtCore import QCoreApplication, QPointF, QTimer
 import json
 
-from BlackBoxr.utilities import first, getDuration, randomString
+from BlackBoxr.utilities import formatTimestamp, parseTimestamp, randomString, timestamp
 from BlackBoxr.misc.objects import datadir, tmpdir, systems
 import BlackBoxr.misc.configuration as configuration
+from BlackBoxr.misc import cache, storage
+from BlackBoxr.misc.storage import copyTree
+from BlackBoxr.misc.trace import Trace
+
+class ChangeTracker():
+    '''
+    Version counter and update stamp shared by systems and elements. Mutators call touch(), which
+    bumps the version and stamps the wall clock. Dates are held as epoch seconds and only
+    rendered in the saved format when createDate or updateDate is read. Inside batch() subscribers hear about changes once, when the outermost batch ends.
+    Every change also drops the cached content hash.
+    '''
+    __slots__ = ()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def created(self) -> float:
+        return self._created
+
+    @property
+    def updated(self) -> float:
+        return self._updated
+
+    @property
+    def createDate(self) -> str:
+        return formatTimestamp(self._created)
+
+    @createDate.setter
+    def createDate(self, value):
+        self._created = parseTimestamp(value)
+        self._contentHash = None
+
+    @property
+    def updateDate(self) -> str:
+        return formatTimestamp(self._updated)
+
+    @updateDate.setter
+    def updateDate(self, value):
+        self._updated = parseTimestamp(value)
+        self._contentHash = None
 
-class System():
+    def generateCreateTime(self):
+        self._created = timestamp()
+        return self.createDate
+
+    def touch(self):
+        self._version += 1
+        self._updated = timestamp()
+        self._contentHash = None
+        if not self._batch:
+            self.notify()
+
+    @contextmanager
+    def batch(self):
+        start = self._version
+        self._batch += 1
+        try:
+            yield self
+        finally:
+            self._batch -= 1
+            if not self._batch and self._version != start:
+                self.notify()
+
+class TrackedField():
+    ''' Stores a plain value in "_<name>" and touches the owner when a different value is assigned '''
+    __slots__ = ('attr',)
+
+    def __set_name__(self, owner, name):
+        self.attr = '_' + name
+
+    def __get__(self, obj, objtype = None):
+        if obj is None:
+            return self
+        return getattr(obj, self.attr)
+
+    def __set__(self, obj, value):
+        # The first assignment happens while the owner is initialised and is not a change
+        old = getattr(obj, self.attr, value)
+        object.__setattr__(obj, self.attr, value)
+        if value is not old and value != old:
+            obj.touch()
+
+class LinkSet(dict):
+    '''
+    Insertion ordered set of linked UUID strings with constant time membership, insert and
+    delete. Keeps append/remove so it can stand in for the lists it replaces.
+    '''
+    __slots__ = ()
+
+    def add(self, link : str) -> bool:
+        ''' Returns whether the link was new '''
+        if link in self:
+            return False
+        self[intern(link)] = None
+        return True
+
+    def discard(self, link : str) -> bool:
+        ''' Returns whether the link was present '''
+        return self.pop(link, False) is None
+
+    def append(self, link : str):
+        self.add(link)
+
+    def remove(self, link : str):
+        del self[link]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+class ChangeKind(Enum):
+    ADDED    = 'added'
+    REMOVED  = 'removed'
+    MODIFIED = 'modified'
+
+class SystemChange():
+    '''
+    UUIDs of the items added, removed and modified since the last delivery, in the order they were
+    first reported. Modifying something added in the same change is folded into the addition, and
+    items added then removed again drop out entirely. Items removed then added back are in both
+    removed and added, the removal coming first, since they now sit at the end of their list.
+    '''
+    __slots__ = ('added', 'removed', 'modified')
+
+    def __init__(self) -> None:
+        self.added    = LinkSet()
+        self.removed  = LinkSet()
+        self.modified = LinkSet()
+
+    def record(self, kind : ChangeKind, uuid : str):
+        if kind is ChangeKind.MODIFIED:
+            if uuid not in self.added:
+                self.modified.add(uuid)
+        elif kind is ChangeKind.ADDED:
+            self.added.add(uuid)
+        else:
+            self.modified.discard(uuid)
+            if not self.added.discard(uuid):
+                self.removed.add(uuid)
+
+    def recordNew(self, uuids):
+        ''' Records the addition of items that were never reported before '''
+        self.added.update(dict.fromkeys(uuids))
+
+    def get(self, kind : ChangeKind) -> LinkSet:
+        return getattr(self, kind.value)
+
+    def __len__(self) -> int:
+        return len(self.added) + len(self.removed) + len(self.modified)
+
+    def __repr__(self) -> str:
+        return "SystemChange(added={}, removed={}, modified={})".format(self.added, self.removed, self.modified)
+
+class System(ChangeTracker):
+
+    name = TrackedField()
     
     @staticmethod
-    def getDummySystemFromFile(path):
-        d = json.load(open(path))
-        e = System()
-        e.uuid                = uuid.UUID(d['uuid'])
-        e.name                = d['name']
-        e.createDate          = d['createDate']
-        e.updateDate          = d['updateDate']
-
+    def getDummySystemFromFile(path, listing = None):
+        '''
+        Builds an empty system carrying only the file's name, uuid and dates. These are read from
+        the start of the file and the end of its journal, so the cost does not grow with the
+        system. listing can hold the names in the file's directory.
+        '''
+        d = storage.readHeader(path)
+        if d is None:
+            with open(path) as fp:
+                d = json.load(fp)
+        header = storage.readJournalHeader(path, listing)
+        if header is not None:
+            d = dict(d, **header)
+        return System.fromHeader(d)
 
+    @staticmethod
+    def fromHeader(header : dict):
+        ''' Builds an empty system from the uuid, name and dates in header. It is not registered in objects.systems. '''
+        e = System()
+        systems.discard(e)
+        e.__dict__.update(
+            uuid     = uuid.UUID(header['uuid']),
+            _name    = header['name'],
+            _created = parseTimestamp(header['createDate']),
+            _updated = parseTimestamp(header['updateDate'])
+        )
         return e
 
     @staticmethod
     def loadFromFile(path):
-        return System.fromDict(json.load(open(path)))
+        with open(path) as fp:
+            e = System.fromStr(fp.read())
+        records = storage.readJournal(path)
+        if records:
+            e._replay(records)
+        e._basePath = path
+        systems.touch(e)
+        return e
 
     @staticmethod
-    def fromDict(inDict : dict):
+    def fromStr(inStr : str):
+        '''
+        Decodes a system in a single pass. Element dicts are turned into their final typed
+        elements as the decoder produces them, so nothing is copied or registered twice.
+        '''
         e = System()
+        return e._assemble(e._decode(inStr))
 
-        ''' Identifiers '''
-        e.uuid = uuid.UUID(inDict['uuid'])
-        
-        e.name                = inDict['name']
-        e.createDate          = inDict['createDate']
-        e.DL                  = [DesignElement.fromDict(dl, e) for dl in inDict['DesignElements']]
-        e.RL                  = [RequirementElement.fromDict(rl, e) for rl in inDict['RequirementElements']]
-        e.TE                  = [TestElement.fromDict(te, e) for te in inDict['TestElements']]
-        e.updateDate          = inDict['updateDate']
-        return copy.deepcopy(e)
+    def _decode(self, inStr : str) -> dict:
+        # Parses a saved system, building its elements for this one
+        def hook(d : dict):
+            if 'private' in d and 'uuid' in d and 'createDate' in d:
+                if 'topSockets' in d:
+                    return DesignElement.build(d, self)
+                elif 'owningDL' in d:
+                    return RequirementElement.build(d, self)
+                return TestElement.build(d, self)
+            return d
+
+        return json.loads(inStr, object_hook=hook)
+
+    @staticmethod
+    def fromDict(inDict : dict):
+        e = System()
+        d = copy.deepcopy(inDict)
+        d['DesignElements']      = [DesignElement.build(dl, e) for dl in d['DesignElements']]
+        d['RequirementElements'] = [RequirementElement.build(rl, e) for rl in d['RequirementElements']]
+        d['TestElements']        = [TestElement.build(te, e) for te in d['TestElements']]
+        return e._assemble(d)
+
+    def _assemble(self, inDict : dict):
+        # Writes the stored fields directly so loading does not stamp a new updateDate
+        systems.discard(self)
+        self.__dict__.update(
+            uuid       = uuid.UUID(inDict['uuid']),
+            _name      = inDict['name'],
+            _created   = parseTimestamp(inDict['createDate']),
+            _updated   = parseTimestamp(inDict['updateDate']),
+            DL         = inDict['DesignElements'],
+            RL         = inDict['RequirementElements'],
+            TE         = inDict['TestElements'],
+            _exposed   = {},
+            _contentHash = None
+        )
+        self.reindex()
+        systems.add(self)
+        return self
+
+    def _replay(self, records : list[dict]):
+        ''' Applies journal records on top of the freshly loaded base, without reporting them as changes '''
+        header = None
+        # uuid -> latest record, ordered by when each item was first added
+        latest = {}
+        # Items removed then added again, they go back in at the end of their list
+        readded = set()
+        for record in records:
+            if 'system' in record:
+                header = record['system']
+            else:
+                previous = latest.get(record['uuid'])
+                if previous is not None and 'element' not in previous and 'element' in record:
+                    del latest[record['uuid']]
+                    readded.add(record['uuid'])
+                latest[record['uuid']] = record
+
+        builders = {cls.listName : cls for cls in (DesignElement, RequirementElement, TestElement)}
+        lists = self.elementLists()
+        # uuid -> element rebuilt from its record, replacing the loaded one in place
+        placed = {}
+        for listName, elements in lists.items():
+            kept = []
+            for element in elements:
+                uuid = str(element.uuid)
+                record = latest.get(uuid)
+                if record is None:
+                    kept.append(element)
+                elif record.get('list') == listName and uuid not in readded:
+                    if uuid not in placed:
+                        placed[uuid] = builders[listName].build(record['element'], self)
+                    kept.append(placed[uuid])
+            elements[:] = kept
+        for uuid, record in latest.items():
+            if 'element' in record and uuid not in placed:
+                lists[record['list']].append(builders[record['list']].build(record['element'], self))
+
+        if header is not None:
+            self.__dict__.update(_name=header['name'], _updated=parseTimestamp(header['updateDate']))
+        self._contentHash = None
+        self.reindex()
+
+    def elementLists(self) -> dict:
+        return {DesignElement.listName : self.DL, RequirementElement.listName : self.RL, TestElement.listName : self.TE}
 
     def addRequirement(self, requirement):
         self.RL.append(requirement)
-        self.notify()
+        self.register(requirement)
+        self.recordChange(ChangeKind.ADDED, requirement)
+
+    def createRequirements(self, rows) -> list:
+        '''
+        Creates a requirement for each row, a dict of public fields or None, with the fields of
+        requiremenPublicFields it lacks left empty. The elements share one timestamp, are
+        registered once each and reach subscribers as a single change.
+        '''
+        stamp = timestamp()
+        blank = dict.fromkeys(self.requiremenPublicFields, '')
+        created, uuids = [], []
+        for row in rows:
+            uid = uuid.uuid4()
+            requirement = RequirementElement.create(self, dict(blank, **row) if row else dict(blank), stamp, uid.int)
+            key = intern(str(uid))
+            self._index[key] = requirement
+            created.append(requirement)
+            uuids.append(key)
+        if created:
+            self.resetTraces(RequirementElement.listName)
+            self.RL.extend(created)
+            self._changes.recordNew(uuids)
+            self._unsaved.recordNew(uuids)
+            self.stampChange(stamp)
+        return created
 
     def addTest(self, test):
-        self.RL.append(test)
-        self.notify()
+        self.TE.append(test)
+        self.register(test)
+        self.recordChange(ChangeKind.ADDED, test)
 
     def addDL(self, dl):
         self.DL.append(dl)
-        self.notify()
+        self.register(dl)
+        self.recordChange(ChangeKind.ADDED, dl)
+
+    def removeElement(self, element):
+        # Matched by identity, an equal-content copy is a different element and must stay
+        for elements in (self.DL, self.RL, self.TE):
+            for i, candidate in enumerate(elements):
+                if candidate is element:
+                    del elements[i]
+                    break
+        self._index.pop(str(element.uuid), None)
+        self.recordChange(ChangeKind.REMOVED, element)
+
+    def register(self, element):
+        self._index[intern(str(element.uuid))] = element
+
+    def reindex(self):
+        ''' Rebuilds the UUID index after the element lists were replaced wholesale '''
+        self.resetTraces()
+        self._index.clear()
+        for element in self.getAllElements():
+            self.register(element)
 
     def subscribe(self, fn):
+        ''' fn is called with a SystemChange describing everything that changed since its last call '''
         self.subscribers.append(fn)
 
+    # A transaction is a system wide batch: everything inside it is delivered as one change
+    transaction = ChangeTracker.batch
+
+    def touch(self):
+        self.recordChange(ChangeKind.MODIFIED, self)
+
+    def elementChanged(self, element):
+        self.recordChange(ChangeKind.MODIFIED, element)
+
+    def elementExposed(self, element):
+        # Keeps the digest the element had before it could be changed in place, see recordInPlaceChanges
+        self._contentHash = None
+        uuid = str(element.uuid)
+        index = self.__dict__.get('_index')
+        if index is None or index.get(uuid) is not element or uuid in self._exposed:
+            return
+        if uuid in self._unsaved.added or uuid in self._unsaved.modified:
+            return
+        self._exposed[uuid] = element.contentHash()
+
+    def recordInPlaceChanges(self):
+        '''
+        Records as modified the elements whose containers were changed in place since they were
+        handed out, so saves and unloads see edits made without a touch.
+        '''
+        exposed, self._exposed = self._exposed, {}
+        with self.batch():
+            for uuid, digest in exposed.items():
+                element = self.searchByUUID(uuid)
+                if element is not None and element.contentHash() != digest:
+                    element.touch()
+
+    def recordChange(self, kind : ChangeKind, item):
+        if kind is not ChangeKind.MODIFIED:
+            self.resetTraces(getattr(item, 'listName', None))
+        uuid = str(item.uuid)
+        self._changes.record(kind, uuid)
+        self._unsaved.record(kind, uuid)
+        self.stampChange()
+
+    def stampChange(self, stamp : float = None):
+        ''' Counts one change to the system: bumps the version, stamps it and schedules delivery '''
+        self._version += 1
+        self._updated = timestamp() if stamp is None else stamp
+        self._contentHash = None
+        if not self._batch:
+            self.notify()
+
     def notify(self):
+        '''
+        Schedules delivery of the collected changes. With an event loop running, changes reported
+        during one turn of the loop are delivered together at the start of the next.
+        '''
+        if self._batch or self._scheduled:
+            return
+        if QCoreApplication.instance() is None:
+            self.flush()
+        else:
+            self._scheduled = True
+            QTimer.singleShot(0, self.flush)
+
+    def flush(self):
+        ''' Delivers the collected changes to subscribers right away '''
+        self._scheduled = False
+        if self._batch:
+            return
+        # Element subscribers held back by a batch hear about their changes first
+        pending, self._pending = self._pending, {}
+        for element in pending.values():
+            element.notify()
+        if not self._changes:
+            return
+        changes, self._changes = self._changes, SystemChange()
         for function in self.subscribers:
-            function()
+            function(changes)
+
+    def isDirty(self) -> bool:
+        ''' True when the system changed since it was last loaded or saved '''
+        return self._version != self._savedVersion
 
     def __init__(self) -> None:
+        ''' Change tracking '''
+        self._version = 0
+        self._savedVersion = 0
+        self._batch = 0
+        # id(element) -> element whose notification waits for the current batch to end
+        self._pending = {}
+        self._changes = SystemChange()
+        self._scheduled = False
+
+        ''' Persistence, changes not yet written and the base file a journal may extend '''
+        self._unsaved = SystemChange()
+        self._basePath = None
+        # str(uuid) -> digest of an element from before its containers were handed out
+        self._exposed = {}
+        # Digest of the system, see contentHash
+        self._contentHash = None
+
         self.DL = []
         self.RL = []
         self.TE = []
 
+        # str(uuid) -> element, kept in sync by addRequirement/addDL/addTest
+        self._index = {}
+        # listName -> Trace, built on first query and reset when elements come or go
+        self._traces = {}
+
         self.subscribers = []
 
         self.requiremenPublicFields = ['Name', 'Requirement', 'Rationale', 'Metric']
@@ -87,34 +496,117 @@ class System():
         self.name = "Default System Name"
         self.uuid = uuid.uuid4()
 
-        self.createDate = self.generateCreateTime()
-        self.updateDate = self.createDate
+        self.generateCreateTime()
+        self._updated = self._created
 
-        if self not in systems:
-            systems.append(self)
+        systems.add(self)
 
 
     def setName(self, name):
         self.name = copy.deepcopy(name)
 
+    # Element data unloadData can drop, it is read back from the base file on next access
+    PAGED = ('DL', 'RL', 'TE', '_index')
+
     def unloadData(self):
-        pass
+        '''
+        Drops the elements of a system whose changes are all saved. They are reloaded from its
+        file the next time they are used. Returns whether anything was dropped.
+        '''
+        if 'RL' in self.__dict__:
+            self.recordInPlaceChanges()
+        if 'RL' not in self.__dict__ or self.isDirty() or self._unsaved or self._basePath is None or not os.path.exists(self._basePath):
+            return False
+        for name in System.PAGED:
+            del self.__dict__[name]
+        self.resetTraces()
+        return True
+
+    def __getattr__(self, name):
+        # Only reached for missing attributes, which for PAGED means unloadData dropped them
+        if name in System.PAGED and self.__dict__.get('_basePath') is not None:
+            self.reloadData()
+            return self.__dict__[name]
+        raise AttributeError("'System' object has no attribute '{}'".format(name))
+
+    def reloadData(self):
+        with open(self._basePath) as fp:
+            d = self._decode(fp.read())
+        self.__dict__.update(DL=d['DesignElements'], RL=d['RequirementElements'], TE=d['TestElements'], _index={})
+        records = storage.readJournal(self._basePath)
+        if records:
+            self._replay(records)
+        else:
+            self.reindex()
+
+    def footprint(self) -> int:
+        ''' Estimated memory held by the elements, 0 while they are unloaded '''
+        return len(self.__dict__['_index']) * cache.ELEMENTFOOTPRINT if '_index' in self.__dict__ else 0
 
     def searchByUUID(self, uuid):
-        a = copy.deepcopy(uuid)
-        s = self.DL + self.RL + self.TE
-        if isinstance(uuid, UUID):
-            a = str(a)
-        return first(x for x in s if str(x.uuid) == a)
+        return self._index.get(uuid if isinstance(uuid, str) else str(uuid))
         
+    def linkRequirements(self, pairs):
+        '''
+        Adds many upstream -> downstream requirement links in one call. Each pair holds elements
+        or UUIDs of elements in this system. Subscribers are notified once.
+        '''
+        with self.batch():
+            for source, target in pairs:
+                self._resolve(source).addDownstream(self._resolve(target))
+
+    def unlinkRequirements(self, pairs):
+        with self.batch():
+            for source, target in pairs:
+                self._resolve(source).removeDownstream(self._resolve(target))
+
+    def connectDesignElements(self, pairs):
+        ''' Adds many source -> target design element connections in one call '''
+        with self.batch():
+            for source, target in pairs:
+                self._resolve(source).addConnectionTo(self._resolve(target))
+
+    def trace(self, design = False) -> Trace:
+        '''
+        Traceability queries (downstream, roots, depth, path) over the requirement links, or over
+        the design connections with design set
+        '''
+        if design:
+            listName, attribute, forward, backward = DesignElement.listName, 'DL', DesignElement.connectionTo, DesignElement.connectionFrom
+        else:
+            listName, attribute, forward, backward = RequirementElement.listName, 'RL', RequirementElement.downstream, RequirementElement.upstream
+        trace = self._traces.get(listName)
+        if trace is None:
+            trace = self._traces[listName] = Trace(self, attribute, forward, backward)
+        return trace
+
+    def resetTraces(self, listName = None):
+        # Reset in place rather than dropped, callers may hold on to a trace
+        for name, trace in self._traces.items():
+            if listName is None or name == listName:
+                trace.reset()
+
+    def linkChanged(self, source, target, added : bool):
+        trace = self._traces.get(source.listName)
+        if trace is not None:
+            trace.linkChanged(str(source.uuid), str(target.uuid), added)
+
+    def _resolve(self, item):
+        if isinstance(item, Element):
+            return item
+        element = self.searchByUUID(item)
+        if element is None:
+            raise KeyError("No element with uuid {} in system {}".format(item, self.uuid))
+        return element
+
     def getAllElements(self):
         return self.DL + self.RL + self.TE
 
-    def generateCreateTime(self):
-        self.createDate = datetime.now().strftime("%m/%d/%y %H:%M:%S")
-        return self.createDate
-
-    def toDict(self):
+    def toDict(self, detached = False):
+        '''
+        Builds the serialized form of the system. The result shares containers with the live model
+        unless detached is set.
+        '''
         d = {}
         d['name'               ] = self.name
         d['createDate'         ] = self.createDate
@@ -123,60 +615,257 @@ class System():
         d['DesignElements'     ] = [dl.toDict() for dl in self.DL]
         d['RequirementElements'] = [rl.toDict() for rl in self.RL]
         d['TestElements'       ] = [te.toDict() for te in self.TE]
-        return copy.deepcopy(d)
+        return copyTree(d) if detached else d
+
+    def defaultPath(self):
+        name = str(self.uuid) if configuration.namingstyle == 'By UUID' else self.name
+        return "{}/{}.json".format(datadir, name)
+
+    def snapshot(self):
+        ''' Detached copy of the serialized system, safe to hand to another thread '''
+        return self.toDict(detached=True)
 
     def save(self, filename = None):
         if isinstance(filename, NoneType):
-            name = str(self.uuid) if configuration.namingstyle == 'By UUID' else self.name
-            filename = "{}/{}.json".format(datadir, name)
-        with open(filename, "w+") as outfile:
-            outfile.write(json.dumps(self.toDict()))
+            filename = self.defaultPath()
+        if configuration.savemode == 'Journal':
+            return self.saveJournal(filename)
+        return self._writeBase(filename)
+
+    def _writeBase(self, filename):
+        # Queued background writes would otherwise land on top of this one
+        storage.waitForSaves()
+        self.recordInPlaceChanges()
+        version = self._version
+        storage.writeAtomic(filename, self.toDict())
+        storage.removeJournals(filename)
+        self._unsaved = SystemChange()
+        self._basePath = filename
+        self._savedVersion = version
+        systems.touch(self)
+        storage.signals().finished.emit(filename)
+        return filename
+
+    def saveInBackground(self, filename = None):
+        '''
+        Saves without blocking the GUI. In journal mode only the changed elements are appended,
+        otherwise a snapshot is written by compact(). Completion is reported through
+        storage.signals(). Returns the destination path.
+        '''
+        if isinstance(filename, NoneType):
+            filename = self.defaultPath()
+        if configuration.savemode == 'Journal' and filename == self._basePath and os.path.exists(filename):
+            self.saveJournal(filename)
+        else:
+            self.compact(filename)
+        return filename
+
+    def saveJournal(self, filename = None):
+        '''
+        Appends the items changed since the last save to the file's journal instead of rewriting
+        it. Writes the whole file when it does not hold this system's base yet.
+        '''
+        if isinstance(filename, NoneType):
+            filename = self.defaultPath()
+        if filename != self._basePath or not os.path.exists(filename):
+            return self._writeBase(filename)
+        self.recordInPlaceChanges()
+        if not self.isDirty() and not self._unsaved:
+            storage.signals().finished.emit(filename)
+            return filename
+
+        version = self._version
+        size = storage.appendJournal(filename, self.journalRecords())
+        self._unsaved = SystemChange()
+        self._savedVersion = version
+
+        storage.signals().finished.emit(filename)
+        if size > max(storage.COMPACTMINBYTES, os.path.getsize(filename) * storage.COMPACTRATIO):
+            self.compact(filename)
         return filename
 
-    def deltaSinceUpdate(self):
-        return getDuration(datetime.strptime(self.updateDate, "%m/%d/%y %H:%M:%S"))['seconds']
+    def journalRecords(self) -> list[dict]:
+        records = [{'system' : {'name' : self.name, 'updateDate' : self.updateDate}}]
+        for uuid in self._unsaved.removed:
+            records.append({'uuid' : uuid, 'removed' : True})
+        for uuid in list(self._unsaved.added) + list(self._unsaved.modified):
+            element = self.searchByUUID(uuid)
+            if element is not None:
+                records.append({'uuid' : uuid, 'list' : element.listName, 'element' : element.toDict()})
+        return records
+
+    def compact(self, filename = None):
+        '''
+        Writes a full snapshot as the new base file on a worker thread. Journals written so far
+        are set aside now and removed once the base is in place.
+        '''
+        if isinstance(filename, NoneType):
+            filename = self.defaultPath()
+        self.recordInPlaceChanges()
+        version = self._version
+        cleanup = storage.rotatedJournals(filename)
+        rotated = storage.rotateJournal(filename)
+        if rotated is not None:
+            cleanup.append(rotated)
+        self._unsaved = SystemChange()
+        self._basePath = filename
+        systems.touch(self)
+        storage.saveInBackground(self.snapshot(), filename, lambda path: self.markSaved(version), lambda path: self.discardBase(path), cleanup)
+        return filename
 
-    def __setattr__(self, key, value):
-        if hasattr(self, key):
-            if key not in ['updateDate'] and value != self.__getattribute__(key):
-                self.updateDate = datetime.now().strftime("%m/%d/%y %H:%M:%S")
-        super().__setattr__(key, value)
+    def markSaved(self, version : int):
+        # A save that finishes late must not hide changes made after its snapshot
+        self._savedVersion = max(self._savedVersion, version)
+
+    def discardBase(self, path : str):
+        # The base on disk is older than the changes the journal would build on, write it in full next time
+        if path == self._basePath:
+            self._basePath = None
+
+    def deltaSinceUpdate(self) -> float:
+        ''' Seconds since the system was last updated '''
+        return timestamp() - self._updated
+
+    def contentHash(self) -> bytes:
+        '''
+        Merkle digest of the system: its header fields followed by the content hashes of its
+        elements, list by list. It is cached until the next change the system records, and an
+        element change only rehashes that element.
+        '''
+        if self._contentHash is None:
+            digest = hashlib.blake2b(json.dumps([self.name, self.createDate, self.updateDate, str(self.uuid)]).encode(), digest_size=16)
+            for elements in (self.DL, self.RL, self.TE):
+                digest.update(b'|')
+                for element in elements:
+                    digest.update(element.contentHash())
+            self._contentHash = digest.digest()
+        return self._contentHash
 
     def __eq__(self, __o: object) -> bool:
         if isinstance(__o, System):
-            return self.toDict() == __o.toDict()
+            return self is __o or self.contentHash() == __o.contentHash()
         elif isinstance(__o, dict):
             return self.toDict() == __o
         return False
 
+    def __hash__(self) -> int:
+        # Equal systems share their uuid, and it does not change as the content does
+        return hash(self.uuid)
+
 # Stuff that goes into a system
 
-class Element():
+class LazyField():
+    '''
+    Exposes the slot "_<name>" as a container attribute. Empty containers are kept as None and
+    only allocated by factory once the attribute is first accessed, so elements that never use a
+    field do not pay for it. Assigning different contents touches the owner unless tracked is off.
+    Tracked containers can also be changed in place, so handing one out tells the owner through
+    exposed(). Reads that change nothing should use peek().
+    '''
+    __slots__ = ('slot', 'factory', 'tracked')
+
+    def __init__(self, factory, tracked = True):
+        self.factory = factory
+        self.tracked = tracked
+
+    def __set_name__(self, owner, name):
+        self.slot = owner.__dict__['_' + name]
+
+    def __get__(self, obj, objtype = None):
+        if obj is None:
+            return self
+        value = self.slot.__get__(obj)
+        if value is None:
+            value = self.factory()
+            self.slot.__set__(obj, value)
+        if self.tracked:
+            obj.exposed()
+        return value
+
+    def __set__(self, obj, value):
+        old = self.peek(obj)
+        self.slot.__set__(obj, value)
+        if self.tracked and value is not old and value != old:
+            obj.touch()
+
+    def peek(self, obj):
+        ''' Returns the stored container, or a fresh empty one without storing it '''
+        value = self.slot.__get__(obj)
+        return self.factory() if value is None else value
+
+def defaultPrivate():
+    return {'tags' : []}
+
+def compactList(inList : list):
+    return [intern(item) for item in inList] if inList else None
+
+def compactLinks(inList : list):
+    return LinkSet.fromkeys(intern(item) for item in inList) if inList else None
+
+class Element(ChangeTracker):
+
+    __slots__ = ('owningSystem', '_uuid', '_public', '_private', '_created', '_updated', '_version', '_batch', '_subscribelist', '_contentHash')
+
+    public        = LazyField(dict)
+    private       = LazyField(defaultPrivate)
+    subscribelist = LazyField(list, tracked=False)
 
     @staticmethod
     def diff(elementA, elementB):
-        return list(diff(elementA.toDict(), elementB.toDict()))
+        return list(diff(elementA.toDict(True), elementB.toDict(True)))
 
     @staticmethod
     def fromDict(inDict : dict, owningSystem : System = None):
-        e = Element(owningSystem)
-
-        ''' Identifiers '''
-        e.uuid = uuid.UUID(inDict['uuid'])
-        
-        ''' Fields are used to denote public and private fields '''
-        e.public = inDict['public']
-        e.private = inDict['private']
-
-        ''' Time tracking '''
-        e.createDate = inDict['createDate']
-        e.updateDate = inDict['updateDate']
-
-        return copy.deepcopy(e)
+        return Element.build(copy.deepcopy(inDict), owningSystem)
 
     @staticmethod
     def fromStr(inStr : str, owningSystem : System = None):
-        return Element.fromDict(json.loads(str), owningSystem)
+        return Element.build(json.loads(inStr), owningSystem)
+
+    @classmethod
+    def build(cls, inDict : dict, owningSystem : System = None):
+        '''
+        Creates an element that takes ownership of inDict's contents. Nothing is copied and the
+        element is not registered with owningSystem.
+        '''
+        e = cls.__new__(cls)
+        e._populate(inDict, owningSystem)
+        return e
+
+    def _populate(self, inDict : dict, owningSystem : System):
+        private = inDict['private']
+        self._assign(
+            owningSystem   = owningSystem,
+            _uuid          = uuid.UUID(inDict['uuid']).int,
+            _public        = {intern(key) : value for key, value in inDict['public'].items()} or None,
+            _private       = None if private == defaultPrivate() else private,
+            _created       = parseTimestamp(inDict['createDate']),
+            _updated       = parseTimestamp(inDict['updateDate']),
+            _version       = 0,
+            _batch         = 0,
+            _subscribelist = None,
+            _contentHash   = None
+        )
+
+    def _assign(self, **fields):
+        for key, value in fields.items():
+            object.__setattr__(self, key, value)
+
+    @classmethod
+    def create(cls, owningSystem : System, public : dict, stamp : float, uuidInt : int = None):
+        ''' Creates an element with the given public fields, dates and uuid (a new one by default), without registering it '''
+        e = cls.__new__(cls)
+        e.owningSystem   = owningSystem
+        e._uuid          = uuid.uuid4().int if uuidInt is None else uuidInt
+        e._public        = public or None
+        e._private       = None
+        e._created       = stamp
+        e._updated       = stamp
+        e._version       = 0
+        e._batch         = 0
+        e._subscribelist = None
+        e._contentHash   = None
+        return e
 
     @staticmethod
     def copy(element):
@@ -189,44 +878,79 @@ class Element():
     def subscribe(self, func):
         self.subscribelist.append(func)
 
+    def touch(self):
+        if self.owningSystem is not None:
+            self.owningSystem.elementChanged(self)
+        super().touch()
+
+    def exposed(self):
+        # A container was handed out and may be changed in place, the cached digests can no longer be trusted
+        if self.owningSystem is not None:
+            self.owningSystem.elementExposed(self)
+        self._contentHash = None
+
+    def linkChanged(self, target, added : bool):
+        # Keeps the system's traceability caches current, see System.trace
+        if self.owningSystem is not None:
+            self.owningSystem.linkChanged(self, target, added)
+        if target.owningSystem is not None and target.owningSystem is not self.owningSystem:
+            target.owningSystem.linkChanged(self, target, added)
+
+    @contextmanager
+    def batch(self):
+        # Holds back the owning system's delivery as well, so the batch reaches it as one change
+        system = self.owningSystem
+        with system.batch() if system is not None else nullcontext(), ChangeTracker.batch(self):
+            yield self
+
+    def notify(self):
+        system = self.owningSystem
+        if system is not None and system._batch:
+            system._pending[id(self)] = self
+            return
+        for func in self._subscribelist or ():
+            func()
+
     def __init__(self, owningSystem : System = None) -> None:
         self.owningSystem = owningSystem
 
-        ''' Identifiers '''
-        self.uuid = uuid.uuid4()
+        ''' Identifiers, stored as the 128 bit integer '''
+        self._uuid = uuid.uuid4().int
         
         ''' Fields are used to denote public and private fields '''
-        self.public = {}
-        self.private = {'tags' : []}
+        self._public = None
+        self._private = None
+
+        ''' Change tracking '''
+        self.generateCreateTime()
+        self._updated = self._created
+        self._version = 0
+        self._batch = 0
 
-        ''' Time tracking '''
-        self.createDate = self.generateCreateTime()
-        self.updateDate = self.createDate
+        self._subscribelist = None
 
-        self.subscribelist = []
+        # Digest of toDict(), see contentHash
+        self._contentHash = None
 
         #self.addToSystem()
 
-    def generateCreateTime(self):
-        self.createDate = datetime.now().strftime("%m/%d/%y %H:%M:%S")
-        return self.createDate
+    @property
+    def uuid(self) -> UUID:
+        return UUID(int=self._uuid)
 
-    def toDict(self) -> dict:
+    @uuid.setter
+    def uuid(self, value):
+        self._uuid = value.int if isinstance(value, UUID) else UUID(str(value)).int
+        self.touch()
+
+    def toDict(self, detached = False) -> dict:
         d = {}
         d['uuid'] = str(self.uuid)
-        d['public'] = self.public
-        d['private'] = self.private
+        d['public'] = Element.public.peek(self)
+        d['private'] = Element.private.peek(self)
         d['createDate'] = self.createDate
         d['updateDate'] = self.updateDate
-        return copy.deepcopy(d)
-
-    def __setattr__(self, key, value):
-        if hasattr(self, key):
-            if key not in ['updateDate', 'initflag'] and value != self.__getattribute__(key):
-                self.updateDate = datetime.now().strftime("%m/%d/%y %H:%M:%S")
-                for func in self.subscribelist:
-                    func()
-        super().__setattr__(key, value)
+        return copyTree(d) if detached else d
 
     def __repr__(self) -> str:
         return str(self.uuid)
@@ -234,9 +958,19 @@ class Element():
     def __str__(self) -> str:
         return json.dumps(self.toDict())
 
+    def contentHash(self) -> bytes:
+        '''
+        Digest of toDict(), cached until the element is next touched or one of its containers is
+        handed out, see LazyField. A container kept from before the digest was taken and changed
+        later is not noticed.
+        '''
+        if self._contentHash is None:
+            self._contentHash = hashlib.blake2b(json.dumps(self.toDict(), sort_keys=True).encode(), digest_size=16).digest()
+        return self._contentHash
+
     def __eq__(self, __o: object) -> bool:
         if isinstance(__o, Element):
-            return self.toDict() == __o.toDict()
+            return self is __o or self.contentHash() == __o.contentHash()
         elif isinstance(__o, dict):
             warnings.warn("Warning: instance {} is dict, not Element.".format(__o))
             return self.toDict() == __o
@@ -245,88 +979,132 @@ class Element():
             return str(self) == __o
 
     def __hash__(self) -> int:
-        return hash(tuple(sorted(self.toDict())))
+        # Equal elements share their uuid, and it does not change as the content does
+        return hash(self._uuid)
 
 class DesignElement(Element):
+
+    __slots__ = ('_name', '_topSockets', '_bottomSockets', '_leftSockets', '_rightSockets', '_requirements', '_connectionTo', '_connectionFrom')
+
+    name           : str       = TrackedField()
+
+    listName = 'DesignElements'
+
+    topSockets     : list[str] = LazyField(list)
+    bottomSockets  : list[str] = LazyField(list)
+    leftSockets    : list[str] = LazyField(list)
+    rightSockets   : list[str] = LazyField(list)
+
+    requirements   : list[str] = LazyField(list)
+    connectionTo   : LinkSet = LazyField(LinkSet)
+    connectionFrom : LinkSet = LazyField(LinkSet)
     
     @staticmethod
     def fromDict(inDict: dict, owningSystem: System = None):
-        e = Element.fromDict(inDict, owningSystem)
-        e.__class__ = DesignElement
-        e.name = inDict["name"]  
-        e.topSockets     = inDict["topSockets"]  
-        e.bottomSockets   = inDict["bottomSockets"]
-        e.leftSockets     = inDict["leftSockets"]  
-        e.rightSockets   = inDict["rightSockets"]
-        e.requirements  = inDict["requirements"]
-
-        e.connectionTo = inDict["connectionTo"]
-        e.connectionFrom = inDict["connectionFrom"]
-
-        return copy.deepcopy(e)
+        return DesignElement.build(copy.deepcopy(inDict), owningSystem)
+
+    def _populate(self, inDict: dict, owningSystem: System):
+        super()._populate(inDict, owningSystem)
+        self._assign(
+            _name           = inDict["name"],
+            _topSockets     = compactList(inDict["topSockets"]),
+            _bottomSockets  = compactList(inDict["bottomSockets"]),
+            _leftSockets    = compactList(inDict["leftSockets"]),
+            _rightSockets   = compactList(inDict["rightSockets"]),
+            _requirements   = compactList(inDict["requirements"]),
+            _connectionTo   = compactLinks(inDict["connectionTo"]),
+            _connectionFrom = compactLinks(inDict["connectionFrom"])
+        )
 
     def __init__(self, owningSystem : System = None) -> None:
         super().__init__(owningSystem)
         self.name : str = ""
 
-        self.topSockets    : list[str] = []
-        self.bottomSockets  : list[str] = []
-        self.leftSockets    : list[str] = []
-        self.rightSockets  : list[str] = []
+        self._topSockets     = None
+        self._bottomSockets  = None
+        self._leftSockets    = None
+        self._rightSockets   = None
 
-        self.requirements : list[str] = []
-        self.connectionTo : list[str] = []
-        self.connectionFrom : list[str] = []
+        self._requirements   = None
+        self._connectionTo   = None
+        self._connectionFrom = None
 
         self.addToSystem()
 
     def hasSockets(self)->bool:
-        return len(self.topSockets) == 0 and len(self.bottomSockets) == 0 and len(self.leftSockets) == 0 and len(self.rightSockets) == 0
+        return not (self._topSockets or self._bottomSockets or self._leftSockets or self._rightSockets)
 
     def addToSystem(self):
-        self.owningSystem.DL.append(self)
+        self.owningSystem.addDL(self)
 
-    def toDict(self) -> dict:
+    def toDict(self, detached = False) -> dict:
         d = super().toDict()
         d["name"] = self.name
-        d["topSockets"]   = self.topSockets
-        d["bottomSockets"] = self.bottomSockets
-        d["leftSockets"]   = self.leftSockets
-        d["rightSockets"] = self.rightSockets
-        d["requirements"] = self.requirements
+        d["topSockets"]    = DesignElement.topSockets.peek(self)
+        d["bottomSockets"] = DesignElement.bottomSockets.peek(self)
+        d["leftSockets"]   = DesignElement.leftSockets.peek(self)
+        d["rightSockets"]  = DesignElement.rightSockets.peek(self)
+        d["requirements"]  = DesignElement.requirements.peek(self)
 
-        d["connectionTo"] = self.connectionTo
-        d["connectionFrom"] = self.connectionFrom
+        d["connectionTo"]   = list(DesignElement.connectionTo.peek(self))
+        d["connectionFrom"] = list(DesignElement.connectionFrom.peek(self))
 
-        return copy.deepcopy(d)
+        return copyTree(d) if detached else d
 
     def addConnectionTo(self, targetDL):
-        if str(targetDL.uuid) not in self.connectionTo:
-            self.connectionTo.append(str(targetDL.uuid))
-        if str(self.uuid) not in targetDL.connectionFrom:
-            targetDL.connectionFrom.append(str(self.uuid))
+        changed = self.connectionTo.add(str(targetDL.uuid))
+        if targetDL.connectionFrom.add(str(self.uuid)) or changed:
+            self.linkChanged(targetDL, True)
+            self.touch()
+            targetDL.touch()
 
     def addConnectionFrom(self, sourceDL):
-        if str(sourceDL.uuid) not in self.connectionFrom:
-            self.connectionFrom.append(str(sourceDL.uuid))
-        if str(self.uuid) not in sourceDL.connectionTo:
-            sourceDL.connectionTo.append(str(self.uuid))
+        sourceDL.addConnectionTo(self)
+
+    def removeConnectionTo(self, targetDL):
+        changed = self.connectionTo.discard(str(targetDL.uuid))
+        if targetDL.connectionFrom.discard(str(self.uuid)) or changed:
+            self.linkChanged(targetDL, False)
+            self.touch()
+            targetDL.touch()
 
 
 class RequirementElement(Element):
 
+    __slots__ = ('_owningDL', '_upstream', '_downstream')
+
+    listName = 'RequirementElements'
+
+    owningDL   : str     = TrackedField()
+    upstream   : LinkSet = LazyField(LinkSet)
+    downstream : LinkSet = LazyField(LinkSet)
+
     @staticmethod
     def fromDict(inDict: dict, owningSystem: System = None):
-        e = Element.fromDict(inDict, owningSystem)
-        e.__class__ = RequirementElement
-        e.owningDL          = inDict["owningDL"]  
-        e.upstream          = inDict["upstream"]  
-        e.downstream        = inDict["downstream"]
-        e.addToSystem()
-        return copy.deepcopy(e)
+        e = RequirementElement.build(copy.deepcopy(inDict), owningSystem)
+        if owningSystem != None:
+            e.addToSystem()
+        return e
+
+    def _populate(self, inDict: dict, owningSystem: System):
+        super()._populate(inDict, owningSystem)
+        self._assign(
+            _owningDL   = intern(inDict["owningDL"]),
+            _upstream   = compactLinks(inDict["upstream"]),
+            _downstream = compactLinks(inDict["downstream"])
+        )
+
+    @classmethod
+    def create(cls, owningSystem : System, public : dict, stamp : float, uuidInt : int = None):
+        e = super().create(owningSystem, public, stamp, uuidInt)
+        e._owningDL   = ""
+        e._upstream   = None
+        e._downstream = None
+        return e
 
     @staticmethod
     def random(insys = None):
+        # __init__ has already registered the element with insys
         e = RequirementElement(insys)
         if insys != None:
             e.populateFromSystem(True)
@@ -337,7 +1115,6 @@ class RequirementElement(Element):
                 'Rationale' : randomString(),
                 'Metric' : randomString()
             }
-        e.addToSystem()
         return e
 
 
@@ -349,9 +1126,9 @@ class RequirementElement(Element):
 
     def __init__(self, owningSystem : System = None) -> None:
         super().__init__(owningSystem)
-        self.owningDL   = ""
-        self.downstream = []
-        self.upstream   = []
+        self.owningDL    = ""
+        self._downstream = None
+        self._upstream   = None
         self.populateFromSystem()
         self.addToSystem()
 
@@ -359,56 +1136,61 @@ class RequirementElement(Element):
         self.owningSystem.addRequirement(self)
         #self.owningSystem.RL.append(self)
 
-    def toDict(self) -> dict:
+    def toDict(self, detached = False) -> dict:
         d = super().toDict()
         d["owningDL"]   = self.owningDL
-        d["upstream"]   = self.upstream
-        d["downstream"] = self.downstream
+        d["upstream"]   = list(RequirementElement.upstream.peek(self))
+        d["downstream"] = list(RequirementElement.downstream.peek(self))
 
-        return copy.deepcopy(d)
+        return copyTree(d) if detached else d
 
     def addDownstream(self, RL):
-        if str(RL.uuid) not in self.downstream:
-            self.downstream.append(str(RL.uuid))
-        if str(self.uuid) not in RL.upstream:
-            RL.upstream.append(str(self.uuid))
+        changed = self.downstream.add(str(RL.uuid))
+        if RL.upstream.add(str(self.uuid)) or changed:
+            self.linkChanged(RL, True)
+            self.touch()
+            RL.touch()
 
     def addUpstream(self, RL):
-        if str(RL.uuid) not in self.upstream:
-            self.upstream.append(str(RL.uuid))
-        if str(self.uuid) not in RL.downstream:
-            RL.downstream.append(str(self.uuid))
+        RL.addDownstream(self)
 
     def removeDownstream(self, RL):
-        if str(RL.uuid) in self.downstream:
-            self.downstream.remove(str(RL.uuid))
-        if str(self.uuid) in RL.upstream:
-            RL.upstream.remove(str(self.uuid))
+        changed = self.downstream.discard(str(RL.uuid))
+        if RL.upstream.discard(str(self.uuid)) or changed:
+            self.linkChanged(RL, False)
+            self.touch()
+            RL.touch()
 
     def removeUpstream(self, RL):
-        if str(RL.uuid) in self.upstream:
-            self.upstream.remove(str(RL.uuid))
-        if str(self.uuid) in RL.downstream:
-            RL.downstream.remove(str(self.uuid))
+        RL.removeDownstream(self)
 
     def removeFromStreams(self, RL):
         self.removeDownstream(RL)
         self.removeUpstream(RL)
 
     def isDownstream(self, dsitem) -> bool:
-        return str(dsitem.uuid) in self.downstream
+        return str(dsitem.uuid) in RequirementElement.downstream.peek(self)
 
     def isUpstream(self, usitem) -> bool:
-        return str(self.uuid) in usitem.downstream
+        return str(self.uuid) in RequirementElement.downstream.peek(usitem)
 
 class TestElement(Element):
 
+    __slots__ = ()
+
+    listName = 'TestElements'
+
+    @staticmethod
+    def fromDict(inDict: dict, owningSystem: System = None):
+        return TestElement.build(copy.deepcopy(inDict), owningSystem)
+
     def __init__(self, owningSystem : System = None) -> None:
         super().__init__(owningSystem)
         self.addToSystem()
 
     def addToSystem(self):
-        self.owningSystem.TE.append(self)
+        self.owningSystem.addTest(self)
+
 ####################################
 
 class MoveCommand(QUndoCommand):
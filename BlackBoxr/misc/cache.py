@@ -0,0 +1,92 @@
+import weakref
+from collections import OrderedDict
+
+# Rough resident size of one element and its containers, used to weigh systems against the budget
+ELEMENTFOOTPRINT = 1024
+
+class SystemCache():
+    '''
+    The systems loaded in this session, keyed by UUID. Every live system is reachable through a
+    weak reference, so nothing is kept alive just by being registered. The most recently used
+    ones that have a file are also held strongly, and once their estimated size passes budget the
+    least recently used are paged out with System.unloadData and released. Systems shown in a view
+    are never evicted, the views are held weakly so closing one is enough to release its system.
+    '''
+
+    def __init__(self, budget : int = 256 * 2 ** 20) -> None:
+        self.budget = budget
+        # str(uuid) -> System
+        self.systems = weakref.WeakValueDictionary()
+        # str(uuid) -> System, least recently used first
+        self.recent = OrderedDict()
+        # str(uuid) -> views showing the system
+        self.views = {}
+
+    def __iter__(self):
+        return iter(list(self.systems.values()))
+
+    def __len__(self) -> int:
+        return len(self.systems)
+
+    def __contains__(self, system) -> bool:
+        return self.systems.get(str(system.uuid)) is system
+
+    def get(self, uuid):
+        ''' The resident system with uuid, or None. Counts as a use. '''
+        system = self.systems.get(str(uuid))
+        if system is not None:
+            self.touch(system)
+        return system
+
+    def add(self, system):
+        ''' Registers system under its uuid, replacing any other system registered with it '''
+        self.systems[str(system.uuid)] = system
+        self.touch(system)
+
+    def discard(self, system):
+        uuid = str(system.uuid)
+        if self.systems.get(uuid) is system:
+            del self.systems[uuid]
+            self.recent.pop(uuid, None)
+
+    def touch(self, system):
+        uuid = str(system.uuid)
+        # Systems without a file could not be paged out, whoever created them keeps them alive
+        if self.systems.get(uuid) is not system or system.__dict__.get('_basePath') is None:
+            return
+        self.recent[uuid] = system
+        self.recent.move_to_end(uuid)
+        self.evict()
+
+    def pin(self, system, view):
+        ''' Keeps system resident for as long as view is alive '''
+        self.views.setdefault(str(system.uuid), weakref.WeakSet()).add(view)
+        self.add(system)
+
+    def isOpen(self, uuid) -> bool:
+        views = self.views.get(str(uuid))
+        if views is not None and not views:
+            del self.views[str(uuid)]
+            views = None
+        return views is not None
+
+    def footprint(self) -> int:
+        return sum(system.footprint() for system in self.recent.values())
+
+    def evict(self):
+        '''
+        Releases the least recently used systems until the rest fit in budget. Open systems and
+        ones that cannot be paged out stay, and the most recently used one always does.
+        '''
+        size = self.footprint()
+        for uuid in list(self.recent)[:-1]:
+            if size <= self.budget:
+                break
+            system = self.recent[uuid]
+            if self.isOpen(uuid) or system.isDirty():
+                continue
+            footprint = system.footprint()
+            # Nothing left to page out, or paged out now
+            if footprint == 0 or system.unloadData():
+                size -= footprint
+                del self.recent[uuid]
@@ -0,0 +1,181 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import NamedTuple
+
+from BlackBoxr.misc import objects, storage
+
+class CatalogEntry(NamedTuple):
+    path       : str
+    uuid       : str
+    name       : str
+    createDate : str
+    updateDate : str
+    mtime      : float
+    size       : int
+
+COLUMNS = 'path, uuid, name, createDate, updateDate, mtime, size'
+
+class Catalog():
+    '''
+    Persistent index of the system files in the search dirs, stored in SQLite. Rows are keyed by
+    path and only re-read when a file's mtime or size changes, so keeping it current costs a stat
+    per file. mtime and size cover the file and its journal together.
+    '''
+
+    def __init__(self, path : str) -> None:
+        # Saves finishing on the save worker update the catalog from that thread
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('''CREATE TABLE IF NOT EXISTS systems (
+            path TEXT PRIMARY KEY, uuid TEXT NOT NULL, name TEXT NOT NULL COLLATE NOCASE,
+            createDate TEXT, updateDate TEXT, mtime REAL, size INTEGER)''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS systemsByUUID ON systems (uuid)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS systemsByName ON systems (name COLLATE NOCASE)')
+        try:
+            # Trigram index for substring search, available from SQLite 3.34
+            self.db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS names USING fts5(name, tokenize='trigram')")
+            self.trigrams = True
+        except sqlite3.OperationalError:
+            self.trigrams = False
+        self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    @staticmethod
+    def fingerprint(path : str):
+        ''' (mtime, size) of a system file and its journal, None when the file is gone '''
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        mtime, size = stat.st_mtime, stat.st_size
+        try:
+            journal = os.stat(storage.journalPath(path))
+            mtime, size = max(mtime, journal.st_mtime), size + journal.st_size
+        except FileNotFoundError:
+            pass
+        return mtime, size
+
+    def updateFile(self, path : str, listing = None):
+        ''' Re-reads path if it changed since it was catalogued. Returns whether the row changed. '''
+        path = os.path.normpath(os.path.abspath(path))
+        fingerprint = self.fingerprint(path)
+        if fingerprint is None:
+            return self.removeFile(path)
+        with self.lock:
+            row = self.db.execute('SELECT mtime, size FROM systems WHERE path = ?', (path,)).fetchone()
+        if row is not None and tuple(row) == fingerprint:
+            return False
+
+        try:
+            header = storage.readHeader(path)
+            if header is None:
+                with open(path) as fp:
+                    header = json.load(fp)
+            journal = storage.readJournalHeader(path, listing)
+            if journal is not None:
+                header = dict(header, **journal)
+            entry = (path, header['uuid'], header['name'], header['createDate'], header['updateDate']) + fingerprint
+        except (OSError, ValueError, KeyError, TypeError):
+            # Not a system file, or one caught mid-write
+            return self.removeFile(path)
+
+        with self.lock:
+            # An upsert keeps the rowid the name index refers to
+            self.db.execute('''INSERT INTO systems ({}) VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (path) DO UPDATE SET
+                uuid = excluded.uuid, name = excluded.name, createDate = excluded.createDate,
+                updateDate = excluded.updateDate, mtime = excluded.mtime, size = excluded.size'''.format(COLUMNS), entry)
+            if self.trigrams:
+                rowid = self.db.execute('SELECT rowid FROM systems WHERE path = ?', (path,)).fetchone()[0]
+                self.db.execute('DELETE FROM names WHERE rowid = ?', (rowid,))
+                self.db.execute('INSERT INTO names (rowid, name) VALUES (?, ?)', (rowid, entry[2]))
+            self.db.commit()
+        return True
+
+    def removeFile(self, path : str):
+        with self.lock:
+            row = self.db.execute('SELECT rowid FROM systems WHERE path = ?', (path,)).fetchone()
+            if row is None:
+                return False
+            self.db.execute('DELETE FROM systems WHERE rowid = ?', row)
+            if self.trigrams:
+                self.db.execute('DELETE FROM names WHERE rowid = ?', row)
+            self.db.commit()
+        return True
+
+    def refresh(self, dirs : list[str]):
+        ''' Brings the rows for dirs up to date. Returns whether anything changed. '''
+        changed = False
+        seen = set()
+        for directory in dirs:
+            directory = os.path.normpath(os.path.abspath(directory))
+            listing = os.listdir(directory)
+            for file in listing:
+                if file.endswith('.json'):
+                    path = os.path.join(directory, file)
+                    seen.add(path)
+                    changed = self.updateFile(path, listing) or changed
+            changed = self.prune(directory, seen) or changed
+        return changed
+
+    def prune(self, directory : str, seen : set):
+        ''' Drops the rows of files in directory that are not in seen. Returns whether any were dropped. '''
+        changed = False
+        for entry in self.entriesIn(os.path.normpath(os.path.abspath(directory))):
+            if entry.path not in seen:
+                changed = self.removeFile(entry.path) or changed
+        return changed
+
+    def entriesIn(self, directory : str) -> list[CatalogEntry]:
+        with self.lock:
+            rows = self.db.execute("SELECT {} FROM systems WHERE path LIKE ? ESCAPE '\\'".format(COLUMNS), (escapeLike(directory + os.sep) + '%',)).fetchall()
+        # LIKE also matches files in subdirectories
+        return [CatalogEntry(*row) for row in rows if os.path.dirname(row[0]) == directory]
+
+    def entry(self, path : str):
+        with self.lock:
+            row = self.db.execute('SELECT {} FROM systems WHERE path = ?'.format(COLUMNS), (os.path.normpath(os.path.abspath(path)),)).fetchone()
+        return None if row is None else CatalogEntry(*row)
+
+    def entries(self) -> list[CatalogEntry]:
+        with self.lock:
+            return [CatalogEntry(*row) for row in self.db.execute('SELECT {} FROM systems'.format(COLUMNS))]
+
+    def pathForUUID(self, uuid : str):
+        ''' Newest catalogued file holding the system, or None '''
+        with self.lock:
+            rows = self.db.execute('SELECT path FROM systems WHERE uuid = ? ORDER BY mtime DESC', (str(uuid),)).fetchall()
+        for (path,) in rows:
+            if os.path.exists(path):
+                return path
+            self.removeFile(path)
+        return None
+
+    def search(self, text : str) -> list[CatalogEntry]:
+        ''' Systems whose name starts with text, followed by those containing it further in '''
+        if not text:
+            return self.entries()
+        with self.lock:
+            found = self.db.execute("SELECT {} FROM systems WHERE name LIKE ? ESCAPE '\\' ORDER BY name".format(COLUMNS), (escapeLike(text) + '%',)).fetchall()
+            if self.trigrams and len(text) >= 3:
+                found += self.db.execute('SELECT {} FROM systems WHERE rowid IN (SELECT rowid FROM names WHERE names MATCH ?) ORDER BY name'.format(COLUMNS), ('"{}"'.format(text.replace('"', '""')),)).fetchall()
+            else:
+                found += self.db.execute("SELECT {} FROM systems WHERE name LIKE ? ESCAPE '\\' ORDER BY name".format(COLUMNS), ('%' + escapeLike(text) + '%',)).fetchall()
+        return [CatalogEntry(*row) for row in dict.fromkeys(found)]
+
+def escapeLike(text : str) -> str:
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+workspaceCatalog : Catalog = None
+
+def catalog() -> Catalog:
+    ''' The catalog of objects.searchdirs, kept in objects.tmpdir and updated by every save '''
+    global workspaceCatalog
+    if workspaceCatalog is None:
+        workspaceCatalog = Catalog(os.path.join(objects.tmpdir, 'catalog.sqlite3'))
+        storage.signals().finished.connect(workspaceCatalog.updateFile)
+    return workspaceCatalog
@@ -28,6 +28,15 @@ palette = qdarktheme.load_palette()
 # Naming Style
 namingstyle = u"By UUID"
 
+# Save Mode, "Journal" appends changed elements to a sidecar log instead of rewriting the file
+savemode = u"Full"
+
+# Memory budget in MB for loaded systems that are not open, see objects.systems
+cachebudget = 256
+
+# How diagram views redraw, "Full" repaints the whole viewport on every change. See viewer.UPDATEMODES.
+viewportupdate = u"Smart"
+
 # Config Colors
 SocketColor = ThemedColor(QColor(255, 87, 51, 255), QColor(255, 255, 255, 255))
 NodeBackground = ThemedColor(QColor(211, 211, 211, 255) , QColor(9, 12, 9, 255))
@@ -66,7 +75,7 @@ globalSettingsSizeY = 200
 copypreference = 'None'
 
 def loadSettings():
-    global winx, winy, themename, namingstyle, stylesheet, globalSettingsSizeX, globalSettingsSizeY, copypreference
+    global winx, winy, themename, namingstyle, savemode, cachebudget, viewportupdate, stylesheet, globalSettingsSizeX, globalSettingsSizeY, copypreference
 
     utilities.log('configuration.loadSettings', "Loading Settings...")
 
@@ -84,14 +93,18 @@ def loadSettings():
     stylesheet = qdarktheme.load_stylesheet(themename)
     namingstyle = config['DEFAULT']['namingstyle']
     copypreference = config['DEFAULT']['copypreference']
+    savemode = config['DEFAULT'].get('savemode', getDefaults()['savemode'])
+    cachebudget = int(config['DEFAULT'].get('cachebudget', getDefaults()['cachebudget']))
+    objects.systems.budget = cachebudget * 2 ** 20
+    viewportupdate = config['DEFAULT'].get('viewportupdate', getDefaults()['viewportupdate'])
 
 
 def saveSettings():
     if not os.path.exists(objects.configfile):
         config['DEFAULT'] = getDefaults()
     else:
-        config['DEFAULT'] = {'winx': winx, 'winy': winy, 'themename' : themename, 'namingstyle' : namingstyle, 'globalSettingsSizeX' : globalSettingsSizeX, 'globalSettingsSizeY' : globalSettingsSizeY, 'copypreference' : copypreference}
+        config['DEFAULT'] = {'winx': winx, 'winy': winy, 'themename' : themename, 'namingstyle' : namingstyle, 'globalSettingsSizeX' : globalSettingsSizeX, 'globalSettingsSizeY' : globalSettingsSizeY, 'copypreference' : copypreference, 'savemode' : savemode, 'cachebudget' : cachebudget, 'viewportupdate' : viewportupdate}
     write_file()
 
 def getDefaults() -> dict:
-    return {'winx': '200', 'winy': '150', 'themename' : 'dark', 'namingstyle' : 'By UUID', 'globalSettingsSizeX' : '300', 'globalSettingsSizeY' : '200', 'copypreference' : 'None'}
\ No newline at end of file
+    return {'winx': '200', 'winy': '150', 'themename' : 'dark', 'namingstyle' : 'By UUID', 'globalSettingsSizeX' : '300', 'globalSettingsSizeY' : '200', 'copypreference' : 'None', 'savemode' : 'Full', 'cachebudget' : '256', 'viewportupdate' : 'Smart'}
\ No newline at end of file
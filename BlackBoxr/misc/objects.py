@@ -5,6 +5,7 @@ from typing import cast
 from PySide6.QtGui import QUndoStack
 from appdirs import *
 from BlackBoxr.modules.ExtensionLoader import ExtensionLoader
+from BlackBoxr.misc.cache import SystemCache
 
 from BlackBoxr.utilities import makeDir
 
@@ -19,7 +20,7 @@ configfile = "{}/config.ini".format(configdir)
 
 ### Runtime Data ###
 
-systems = []
+systems = SystemCache()
 
 copiedItems = []
 
@@ -0,0 +1,353 @@
+import json
+import os
+import stat
+import tempfile
+import time
+
+from PySide6.QtCore import QCoreApplication, QEvent, QObject, QRunnable, QThreadPool, Qt, Signal, Slot
+
+def copyTree(value):
+    ''' Copies nested dicts and lists, sharing the immutable leaves. Much cheaper than deepcopy for JSON data. '''
+    if type(value) is dict:
+        return {key : copyTree(item) for key, item in value.items()}
+    elif type(value) is list:
+        return [copyTree(item) for item in value]
+    return value
+
+def streamJSON(data : dict, fp):
+    '''
+    Writes data to fp a piece at a time. Top level lists are written item by item, so no string
+    for the whole document is ever built. The output matches json.dumps.
+    '''
+    fp.write('{')
+    for i, (key, value) in enumerate(data.items()):
+        if i:
+            fp.write(', ')
+        fp.write(json.dumps(key))
+        fp.write(': ')
+        if type(value) is list:
+            fp.write('[')
+            for j, item in enumerate(value):
+                if j:
+                    fp.write(', ')
+                fp.write(json.dumps(item))
+            fp.write(']')
+        else:
+            fp.write(json.dumps(value))
+    fp.write('}')
+
+# Saves write these top level fields ahead of the element lists
+HEADERKEYS = ('name', 'createDate', 'updateDate', 'uuid')
+
+def readHeader(path : str, keys = HEADERKEYS, limit = 64 * 1024):
+    '''
+    Reads the scalar top level fields in keys from the start of a saved file without decoding the
+    rest, normally a single small read. Returns None when a list or object comes first or the
+    fields are not within limit bytes, callers then fall back to a full load.
+    '''
+    decoder = json.JSONDecoder()
+    size = 1024
+    with open(path) as fp:
+        text = fp.read(size)
+        while True:
+            header = scanHeader(text, keys, decoder)
+            if header is not False:
+                return header
+            if size >= limit or len(text) < size:
+                return None
+            text += fp.read(size)
+            size *= 2
+
+def scanHeader(text : str, keys, decoder : json.JSONDecoder):
+    # Returns the fields, None when they cannot be read this way, or False when text ends too soon
+    found = {}
+    pos = skipSpace(text, 0)
+    if not text.startswith('{', pos):
+        return None
+    pos += 1
+    try:
+        while len(found) < len(keys):
+            pos = skipSpace(text, pos)
+            key, pos = decoder.raw_decode(text, pos)
+            pos = skipSpace(text, pos)
+            if text[pos] != ':':
+                return None
+            pos = skipSpace(text, pos + 1)
+            if text[pos] in '[{':
+                return None
+            value, pos = decoder.raw_decode(text, pos)
+            if key in keys:
+                found[key] = value
+            pos = skipSpace(text, pos)
+            if text[pos] == ',':
+                pos += 1
+            elif len(found) < len(keys):
+                return None
+    except (IndexError, ValueError):
+        return False
+    return found
+
+def skipSpace(text : str, pos : int) -> int:
+    while pos < len(text) and text[pos] in ' \t\n\r':
+        pos += 1
+    return pos
+
+# The umask can only be read by setting it, so it is read once while nothing else runs
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+def writeAtomic(path : str, data : dict):
+    '''
+    Streams data into a temporary file next to path, flushes it to disk and renames it over path.
+    A crash at any point leaves either the old file or the new one, never a partial write. The
+    file keeps the mode of the one it replaces, new files get the usual mode for the umask.
+    '''
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temppath = tempfile.mkstemp(prefix='.{}.'.format(os.path.basename(path)), suffix='.tmp', dir=directory)
+    try:
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~UMASK
+        os.chmod(temppath, mode)
+        with os.fdopen(handle, 'w') as fp:
+            streamJSON(data, fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(temppath, path)
+    except BaseException:
+        if os.path.exists(temppath):
+            os.remove(temppath)
+        raise
+    syncDirectory(directory)
+    return path
+
+def syncDirectory(directory : str):
+    # Makes the rename itself durable. Directories cannot be opened this way on Windows.
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+class SaveSignals(QObject):
+    finished = Signal(str)
+    failed   = Signal(str, str)
+
+class SaveCallbacks(QObject):
+    '''
+    Carries the outcome of one background save back to the thread that queued it, where onSaved
+    or onFailed runs and signals() reports it
+    '''
+    # path, error message or an empty string
+    done = Signal(str, str)
+
+    def __init__(self, onSaved = None, onFailed = None):
+        super().__init__()
+        self.onSaved = onSaved
+        self.onFailed = onFailed
+        # Without an event loop nothing would deliver a queued call
+        self.done.connect(self.deliver, Qt.AutoConnection if QCoreApplication.instance() is not None else Qt.DirectConnection)
+
+    @Slot(str, str)
+    def deliver(self, path : str, error : str):
+        delivering.discard(self)
+        if error:
+            if self.onFailed is not None:
+                self.onFailed(path)
+            signals().failed.emit(path, error)
+        else:
+            if self.onSaved is not None:
+                self.onSaved(path)
+            signals().finished.emit(path)
+
+class SaveRunnable(QRunnable):
+    '''
+    Writes a snapshot taken on the GUI thread to disk on a worker thread, then removes the cleanup
+    files the new base makes obsolete
+    '''
+
+    def __init__(self, snapshot : dict, path : str, callbacks : SaveCallbacks, cleanup = ()):
+        super().__init__()
+        self.snapshot = snapshot
+        self.path = path
+        self.callbacks = callbacks
+        self.cleanup = cleanup
+
+    @Slot()
+    def run(self):
+        try:
+            writeAtomic(self.path, self.snapshot)
+            for obsolete in self.cleanup:
+                removeFile(obsolete)
+        except Exception as e:
+            self.callbacks.done.emit(self.path, str(e) or type(e).__name__)
+        else:
+            self.callbacks.done.emit(self.path, '')
+        finally:
+            running.discard(self)
+
+# Saves run one at a time and in order, so an older snapshot never lands on top of a newer one
+savePool : QThreadPool = None
+saveSignals : SaveSignals = None
+# Keeps queued runnables alive until they are done, and their callbacks until they are delivered
+running = set()
+delivering = set()
+
+def signals() -> SaveSignals:
+    ''' Reports every save, connect once to hear about all of them '''
+    global saveSignals
+    if saveSignals is None:
+        saveSignals = SaveSignals()
+    return saveSignals
+
+def saveInBackground(snapshot : dict, path : str, onSaved = None, onFailed = None, cleanup = ()):
+    '''
+    Queues snapshot to be written to path. Once the write is done, onSaved or onFailed is called
+    on the calling thread by its event loop, or by waitForSaves.
+    '''
+    global savePool
+    if savePool is None:
+        savePool = QThreadPool()
+        savePool.setMaxThreadCount(1)
+    signals()
+    callbacks = SaveCallbacks(onSaved, onFailed)
+    delivering.add(callbacks)
+    worker = SaveRunnable(snapshot, path, callbacks, cleanup)
+    running.add(worker)
+    savePool.start(worker)
+
+def waitForSaves(msecs : int = -1) -> bool:
+    ''' Waits for the queued saves and runs the callbacks of those that are done '''
+    done = savePool is None or savePool.waitForDone(msecs)
+    if delivering and QCoreApplication.instance() is not None:
+        QCoreApplication.sendPostedEvents(None, QEvent.MetaCall)
+    return done
+
+def removeFile(path : str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+'''
+Journal
+
+A system file can have a sidecar "<file>.journal" of JSON lines. Every journal save appends one
+batch: a begin marker, one record per changed item and a commit marker. Element records carry the
+whole element, so replaying a batch twice gives the same result. A batch without its commit
+marker, left by a crash, is skipped when reading.
+
+Compaction writes a new base file. The journal is first renamed to "<file>.journal.<n>" so later
+saves go to a fresh one, and the renamed file is removed once the new base is in place.
+'''
+
+JOURNALBEGIN  = '{"journal": "begin"}'
+JOURNALCOMMIT = '{"journal": "commit"}'
+
+# A journal grows until it is this large and this big a fraction of its base, then it is compacted
+COMPACTMINBYTES = 64 * 1024
+COMPACTRATIO    = 0.5
+
+def journalPath(path : str) -> str:
+    return path + '.journal'
+
+def rotatedJournals(path : str, listing = None) -> list[str]:
+    '''
+    Journals set aside by compactions that have not finished yet, oldest first. listing can hold
+    the names in path's directory when the caller already has them.
+    '''
+    directory, name = os.path.split(os.path.abspath(path))
+    prefix = name + '.journal.'
+    listing = os.listdir(directory) if listing is None else listing
+    found = [f[len(prefix):] for f in listing if f.startswith(prefix) and f[len(prefix):].isdigit()]
+    return [os.path.join(directory, prefix + n) for n in sorted(found, key=int)]
+
+def appendJournal(path : str, records : list[dict]) -> int:
+    ''' Appends records to path's journal as one committed batch. Returns the size of the journal. '''
+    lines = [JOURNALBEGIN] + [json.dumps(record) for record in records] + [JOURNALCOMMIT]
+    with open(journalPath(path), 'ab+') as fp:
+        size = fp.seek(0, os.SEEK_END)
+        # A crash can leave a torn last line, every batch starts on a fresh one
+        if size:
+            fp.seek(-1, os.SEEK_END)
+            if fp.read(1) != b'\n':
+                lines.insert(0, '')
+        data = ('\n'.join(lines) + '\n').encode()
+        fp.write(data)
+        fp.flush()
+        os.fsync(fp.fileno())
+    return size + len(data)
+
+def readJournal(path : str) -> list[dict]:
+    ''' Returns the committed records of path's journals, oldest first '''
+    records = []
+    for journal in rotatedJournals(path) + [journalPath(path)]:
+        if not os.path.exists(journal):
+            continue
+        with open(journal) as fp:
+            pending = None
+            for line in fp:
+                line = line.rstrip('\n')
+                if line == JOURNALBEGIN:
+                    pending = []
+                elif line == JOURNALCOMMIT:
+                    if pending is not None:
+                        records.extend(pending)
+                    pending = None
+                elif pending is not None:
+                    try:
+                        pending.append(json.loads(line))
+                    except ValueError:
+                        pending = None
+    return records
+
+def readJournalHeader(path : str, listing = None):
+    '''
+    Returns the newest committed system record of path's journals, or None. Journals are read
+    backwards, so this only touches the last batch.
+    '''
+    for journal in [journalPath(path)] + rotatedJournals(path, listing)[::-1]:
+        if not os.path.exists(journal):
+            continue
+        committed = False
+        for line in reversedLines(journal):
+            if line == JOURNALCOMMIT:
+                committed = True
+            elif line == JOURNALBEGIN:
+                committed = False
+            elif committed and line.startswith('{"system"'):
+                try:
+                    return json.loads(line)['system']
+                except ValueError:
+                    committed = False
+    return None
+
+def reversedLines(path : str, block = 8192):
+    with open(path, 'rb') as fp:
+        end = fp.seek(0, os.SEEK_END)
+        tail = b''
+        while end > 0:
+            start = max(0, end - block)
+            fp.seek(start)
+            lines = (fp.read(end - start) + tail).split(b'\n')
+            # The first piece may be the end of a line that started in an earlier block
+            tail = lines.pop(0)
+            for line in reversed(lines):
+                yield line.decode()
+            end = start
+        yield tail.decode()
+
+def rotateJournal(path : str):
+    ''' Sets path's journal aside for a compaction. Returns the new name, or None without a journal. '''
+    journal = journalPath(path)
+    if not os.path.exists(journal):
+        return None
+    rotated = '{}.{}'.format(journal, time.time_ns())
+    os.replace(journal, rotated)
+    return rotated
+
+def removeJournals(path : str):
+    for journal in rotatedJournals(path) + [journalPath(path)]:
+        removeFile(journal)
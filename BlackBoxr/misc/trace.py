@@ -0,0 +1,117 @@
+from collections import deque
+
+class Trace():
+    '''
+    Traceability queries over one link graph of a system, the requirement links or the design
+    connections. Nodes are UUID strings. What each element reaches is worked out on first use
+    and cached; adding or removing a link only drops the cached results that pass through its
+    source. Links must be changed through the element methods (addDownstream,
+    addConnectionTo and their removals) for the caches to hear about it. The system resets its
+    traces in place when elements come or go, so a trace can be kept as long as the system.
+    '''
+
+    def __init__(self, system, listAttribute : str, forward, backward) -> None:
+        self.system = system
+        # Name of the system attribute holding the elements, looked up each time as it may be replaced
+        self.listAttribute = listAttribute
+        # LazyFields holding the outgoing and incoming links of an element
+        self.forward = forward
+        self.backward = backward
+
+        # uuid -> frozenset of every uuid reachable from it
+        self.closures = {}
+        # uuid -> hops from the nearest root, None until needed
+        self.depths = None
+        self.rootSet = None
+
+    @property
+    def elements(self) -> list:
+        return getattr(self.system, self.listAttribute)
+
+    def reset(self):
+        ''' Drops every cached result '''
+        self.closures.clear()
+        self.depths = None
+        self.rootSet = None
+
+    def key(self, item) -> str:
+        # Elements, UUIDs or UUID strings
+        return item if isinstance(item, str) else str(getattr(item, 'uuid', item))
+
+    def links(self, uuid : str, field):
+        element = self.system.searchByUUID(uuid)
+        return () if element is None else field.peek(element)
+
+    def downstream(self, item) -> frozenset:
+        ''' Every uuid transitively downstream of item, not including item unless it is on a cycle '''
+        start = self.key(item)
+        found = self.closures.get(start)
+        if found is not None:
+            return found
+        reached = set()
+        queue = deque(self.links(start, self.forward))
+        while queue:
+            uuid = queue.popleft()
+            if uuid in reached:
+                continue
+            reached.add(uuid)
+            known = self.closures.get(uuid)
+            if known is not None:
+                # Everything past uuid is already known
+                reached |= known
+            else:
+                queue.extend(self.links(uuid, self.forward))
+        found = self.closures[start] = frozenset(reached)
+        return found
+
+    def roots(self) -> list[str]:
+        ''' Elements nothing links to '''
+        if self.rootSet is None:
+            self.rootSet = {str(e.uuid) : None for e in self.elements if not self.backward.peek(e)}
+        return list(self.rootSet)
+
+    def depth(self, item):
+        ''' Fewest links from a root down to item, None when no root reaches it '''
+        if self.depths is None:
+            self.depths = dict.fromkeys(self.roots(), 0)
+            queue = deque(self.depths)
+            while queue:
+                uuid = queue.popleft()
+                for target in self.links(uuid, self.forward):
+                    if target not in self.depths:
+                        self.depths[target] = self.depths[uuid] + 1
+                        queue.append(target)
+        return self.depths.get(self.key(item))
+
+    def path(self, source, target):
+        ''' Shortest chain of uuids leading from source down to target, or None '''
+        source, target = self.key(source), self.key(target)
+        if source == target:
+            return [source]
+        if target not in self.downstream(source):
+            return None
+        parents = {source : None}
+        queue = deque([source])
+        while target not in parents:
+            uuid = queue.popleft()
+            for child in self.links(uuid, self.forward):
+                if child not in parents:
+                    parents[child] = uuid
+                    queue.append(child)
+        path = [target]
+        while parents[path[-1]] is not None:
+            path.append(parents[path[-1]])
+        return path[::-1]
+
+    def linkChanged(self, source : str, target : str, added : bool):
+        ''' Drops what the link from source to target may have changed '''
+        self.depths = None
+        if self.rootSet is not None:
+            if added:
+                self.rootSet.pop(target, None)
+            elif not self.links(target, self.backward):
+                self.rootSet[target] = None
+        # Only elements that reach source can reach anything new, or lose anything
+        for uuid, closure in list(self.closures.items()):
+            if uuid == source or source in closure:
+                del self.closures[uuid]
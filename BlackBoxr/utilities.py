@@ -1,12 +1,14 @@
 # Get first item in iterable
 import copy
 from datetime import datetime
+from functools import lru_cache
 import logging
 import os
 import platform
 import random
 import string
 import subprocess
+import time
 from PySide6.QtCore import QPointF
 from dictdiffer import diff, patch, swap, revert
 
@@ -22,11 +24,54 @@ def makeDir(path):
   except FileExistsError:
    pass
 
-def getDuration(then, now = datetime.now(), interval = "default"):
+TIMEFORMAT = "%m/%d/%y %H:%M:%S"
+
+def timestamp() -> float:
+  # Wall clock, stamps are saved and compared against time.time(). Ordering uses version counters.
+  return time.time()
+
+@lru_cache(maxsize=256)
+def _formatSecond(second : int) -> str:
+  return datetime.fromtimestamp(second).strftime(TIMEFORMAT)
+
+def formatTimestamp(stamp) -> str:
+  '''
+  Renders an epoch timestamp in the saved date format. Strings are taken to be rendered already
+  and pass through untouched.
+  '''
+  return stamp if isinstance(stamp, str) else _formatSecond(int(stamp))
+
+@lru_cache(maxsize=4096)
+def _parseStamp(stamp : str) -> float:
+  return datetime.strptime(stamp, TIMEFORMAT).timestamp()
+
+def parseTimestamp(stamp) -> float:
+  '''
+  Seconds since the epoch for a date in the saved format. Elements created together share their
+  dates, so repeated strings are parsed once. Numbers pass through.
+  '''
+  return _parseStamp(stamp) if isinstance(stamp, str) else stamp
+
+def relativeTime(stamp : float, now : float = None) -> str:
+  ''' "x days ago" style text for an epoch timestamp, empty within the first second '''
+  seconds = int((time.time() if now is None else now) - stamp)
+
+  text = ""
+
+  text = "{} seconds ago".format(seconds) if seconds > 0 else text
+  text = "{} minutes ago".format(seconds // 60) if seconds // 60 > 1 else text
+  text = "{} hours ago".format(seconds // 3600) if seconds // 3600 > 1 else text
+  text = "{} days ago".format(seconds // 86400) if seconds // 86400 > 0 else text
+  return text
+
+def getDuration(then, now = None, interval = "default"):
 
     # Returns a duration as specified by variable interval
     # Functions, except totalDuration, returns [quotient, remainder]
 
+    if now is None:
+      now = datetime.now()
+
     duration = now - then # For build-in functions
     duration_in_s = duration.total_seconds() 
     
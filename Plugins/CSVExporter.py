@@ -2,18 +2,24 @@ from PySide6.QtWidgets import QFileDialog
 import os
 import csv
 
+# file name -> content hash of the system last exported there
+exported = {}
+
 class Plugin():
     def run(*args, **kwargs):
         insys = kwargs.get('insys')
         fileName = QFileDialog.getSaveFileName(None, ("Save Project"), os.getcwd(), ("CSV Files (*.csv)"))[0]
         if fileName == '':
             return
+        if exported.get(fileName) == insys.contentHash() and os.path.exists(fileName):
+            return fileName
         with open(fileName, 'w') as csvfile:
             writer = csv.DictWriter(csvfile, fieldnames=list(insys.RL[0].public.keys()))
             writer.writeheader()
             for RElement in insys.RL:
                 writer.writerow(RElement.public)
-            
+        exported[fileName] = insys.contentHash()
+
         return fileName
 
     def info():
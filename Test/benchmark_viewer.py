@@ -0,0 +1,85 @@
+'''
+Frame times of a requirements canvas under each viewport update mode.
+
+Builds a 2000 node scene with a trace between neighbouring nodes and times the frames for
+three kinds of interaction: highlighting a socket, dragging a node and panning the view. Run
+from the repository root, headless with QT_QPA_PLATFORM=offscreen:
+
+    python -m Test.benchmark_viewer [nodes] [frames]
+'''
+import statistics
+import sys
+import time
+
+from PySide6.QtWidgets import QApplication
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+from BlackBoxr.misc import objects
+objects.qapp = app
+from BlackBoxr.graphics.nodes import RequirementNode
+from BlackBoxr.graphics.viewer import UPDATEMODES, RequirementsScene, RequirementsViewer
+from BlackBoxr.misc.Datatypes import System
+
+NODES = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+FRAMES = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+COLUMNS = 50
+
+def buildScene(count : int) -> RequirementsScene:
+    system = System()
+    scene = RequirementsScene(system)
+    nodes = []
+    for i, element in enumerate(system.createRequirements([None] * count)):
+        node = RequirementNode(element)
+        scene.addItem(node)
+        node.setPos((i % COLUMNS) * 500, (i // COLUMNS) * 400)
+        nodes.append(node)
+    for upstream, downstream in zip(nodes, nodes[1:]):
+        upstream.connectDownstream(downstream)
+    return scene, nodes
+
+def settle():
+    # Lets the repaint scheduler flush and the view paint
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        app.processEvents()
+
+def timeFrames(step) -> list[float]:
+    times = []
+    for frame in range(FRAMES):
+        start = time.perf_counter()
+        step(frame)
+        app.processEvents()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+def benchmark(scene, nodes, mode : str) -> dict:
+    viewer = RequirementsViewer(scene, scene.sys, updateMode=mode)
+    viewer.resize(1280, 800)
+    viewer.show()
+    viewer.centerOn(nodes[0])
+    settle()
+
+    socket = nodes[0].bottomSocket
+    node = nodes[1]
+    origin = node.pos()
+    bar = viewer.horizontalScrollBar()
+    results = {
+        'highlight' : timeFrames(lambda frame: socket.setSelected(frame % 2 == 0)),
+        'drag'      : timeFrames(lambda frame: node.setPos(origin.x() + frame * 5, origin.y())),
+        'pan'       : timeFrames(lambda frame: bar.setValue(bar.value() + (10 if frame % 20 < 10 else -10))),
+    }
+    node.setPos(origin)
+    viewer.close()
+    viewer.deleteLater()
+    settle()
+    return results
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    scene, nodes = buildScene(NODES)
+    print('Built {} nodes in {:.2f} s, {} frames per interaction'.format(NODES, time.perf_counter() - start, FRAMES))
+    print('{:<10}{:<11}{:>12}{:>12}'.format('mode', 'action', 'mean ms', 'p95 ms'))
+    for mode in UPDATEMODES:
+        for action, times in benchmark(scene, nodes, mode).items():
+            print('{:<10}{:<11}{:>12.2f}{:>12.2f}'.format(mode, action, statistics.mean(times), statistics.quantiles(times, n=20)[-1]))
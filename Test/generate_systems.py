@@ -4,6 +4,6 @@ from BlackBoxr.misc.Datatypes import DesignElement, RequirementElement, System,
 
 testSys = System()
 
-elements = [RequirementElement(testSys) for x in range(10)] + [DesignElement(testSys) for x in range(10)] + [TestElement(testSys) for x in range(10)]
+elements = testSys.createRequirements([None] * 10) + [DesignElement(testSys) for x in range(10)] + [TestElement(testSys) for x in range(10)]
 
 print(testSys.save())
\ No newline at end of file
@@ -1,4 +1,5 @@
 import copy
+import json
 from datetime import datetime
 import logging
 import os
@@ -10,9 +11,11 @@ from BlackBoxr.misc import Datatypes
 from BlackBoxr.misc.Datatypes import DesignElement, Element, RequirementElement, System, TestElement
 from BlackBoxr.graphics.GUITypes import ThemedColor
 from BlackBoxr.misc.objects import datadir, tmpdir
-from BlackBoxr.misc import configuration
+from BlackBoxr.misc import configuration, storage
+from BlackBoxr.misc.cache import SystemCache
 from dictdiffer import diff, patch, swap, revert
 from PySide6.QtGui import QColor
+from uuid import uuid4
 
 testSys = System()
 
@@ -27,6 +30,28 @@ class TestElements:
         assert d in testSys.DL
         assert t in testSys.TE
 
+    def test_ContentHash(self):
+        sys = System()
+        r = RequirementElement(sys)
+        copied = RequirementElement.fromDict(r.toDict())
+        other = RequirementElement(sys)
+
+        assert copied == r and copied.contentHash() == r.contentHash()
+        assert hash(copied) == hash(r) != hash(other)
+        assert len({r, copied, other}) == 2 and copied in {r : 1}
+
+        digest = sys.contentHash()
+        other.public = {"Name": "changed"}
+        assert other.contentHash() != r.contentHash()
+        assert sys.contentHash() != digest
+        assert sys.contentHash() is sys.contentHash()
+
+        digest = sys.contentHash()
+        before = RequirementElement.fromDict(r.toDict())
+        r.public['Name'] = 'edited in place'
+        assert r != before and r.contentHash() != before.contentHash()
+        assert sys.contentHash() != digest
+
     @pytest.mark.last
     def test_UpdateTime_NewData(self):
         '''
@@ -55,6 +80,35 @@ class TestElements:
         duration = k - u
         assert duration.seconds == 0
 
+    def test_Batch(self):
+        sys = System()
+        a = RequirementElement(sys)
+        b = RequirementElement(sys)
+        calls = []
+        a.subscribe(lambda: calls.append('a'))
+        sys.subscribe(lambda changes: calls.append('sys'))
+
+        version = a.version
+        with a.batch():
+            a.public = {"test": "one"}
+            a.public = {"test": "two"}
+            assert calls == []
+        assert calls == ['a', 'sys']
+        assert a.version == version + 2
+
+        calls.clear()
+        with sys.batch():
+            a.addDownstream(b)
+            a.public = {"test": "three"}
+            with a.batch():
+                a.owningDL = "dl"
+            assert calls == []
+        assert calls == ['a', 'sys']
+
+        calls.clear()
+        a.public = {"test": "three"}
+        assert calls == []
+
     def test_StrRep(self):
         '''
         Tests if the string representation matches the dict.
@@ -129,14 +183,250 @@ class TestRL:
         assert str(rl.uuid) in randrl.upstream
         assert str(randrl.uuid) in rl.downstream
 
+    def test_LinkOrder(self):
+        rl = RequirementElement(testSys)
+        targets = [RequirementElement(testSys) for x in range(5)]
+        for target in targets + targets:
+            rl.addDownstream(target)
+        rl.removeDownstream(targets[2])
+
+        expected = [str(t.uuid) for t in targets if t is not targets[2]]
+        assert list(rl.downstream) == expected
+        assert rl.toDict()['downstream'] == expected
+        assert str(rl.uuid) not in targets[2].upstream
+
+    def test_BulkLink(self):
+        sys = System()
+        rls = [RequirementElement(sys) for x in range(50)]
+        pairs = [(rls[i], str(rls[i+1].uuid)) for i in range(49)]
+
+        sys.linkRequirements(pairs)
+        assert all(rls[i].isDownstream(rls[i+1]) for i in range(49))
+        assert all(str(rls[i].uuid) in rls[i+1].upstream for i in range(49))
+
+        sys.unlinkRequirements(pairs[:10])
+        assert not rls[0].isDownstream(rls[1])
+        assert rls[10].isDownstream(rls[11])
+
+        with pytest.raises(KeyError):
+            sys.linkRequirements([(rls[0], uuid4())])
+
+    def test_Trace(self):
+        sys = System()
+        a, b, c, d, e, f = sys.createRequirements([None] * 6)
+        ids = lambda *items: {str(item.uuid) for item in items}
+        sys.linkRequirements([(a, b), (b, c), (d, c)])
+        trace = sys.trace()
+
+        assert trace.downstream(a) == ids(b, c) and trace.downstream(c.uuid) == set()
+        assert set(trace.roots()) == ids(a, d, e, f)
+        assert (trace.depth(a), trace.depth(b), trace.depth(c)) == (0, 1, 1)
+        assert trace.path(a, c) == [str(a.uuid), str(b.uuid), str(c.uuid)] and trace.path(c, a) is None
+
+        c.addDownstream(f)
+        assert trace.downstream(a) == ids(b, c, f) and trace.downstream(d) == ids(c, f)
+        assert f not in [sys.searchByUUID(r) for r in trace.roots()] and trace.depth(f) == 2
+        a.removeDownstream(b)
+        assert trace.downstream(a) == set() and str(b.uuid) in trace.roots()
+        f.addDownstream(d)
+        assert trace.downstream(d) == ids(c, d, f)
+
+        # Kept traces follow elements coming and going
+        g, = sys.createRequirements([None])
+        assert str(g.uuid) in trace.roots() and sys.trace() is trace
+        sys.removeElement(e)
+        assert str(e.uuid) not in trace.roots()
+
+        g = DesignElement(sys)
+        h = DesignElement(sys)
+        sys.connectDesignElements([(g, h)])
+        assert sys.trace(design=True).downstream(g) == ids(h) and sys.trace(design=True).roots() == [str(g.uuid)]
+
+class TestCompact:
+
+    def test_Slots(self):
+        for e in [RequirementElement(testSys), DesignElement(testSys), TestElement(testSys)]:
+            assert not hasattr(e, '__dict__')
+            assert isinstance(e._uuid, int)
+            assert e.uuid.int == e._uuid
+
+    def test_LazyContainers(self):
+        sys = System()
+        rl = RequirementElement(sys)
+        dl = DesignElement(sys)
+
+        assert rl._downstream is None and dl._connectionTo is None
+        assert rl.toDict()['downstream'] == [] and dl.toDict()['connectionTo'] == []
+
+        loaded = System.fromDict(sys.toDict())
+        assert loaded.RL[0]._upstream is None and loaded.DL[0]._private is None
+        assert loaded.RL[0].private == {'tags' : []}
+
+        dl.requirements.append(str(rl.uuid))
+        assert DesignElement.fromDict(dl.toDict()).requirements == [str(rl.uuid)]
+
+class TestDates:
+    def test_Timestamps(self):
+        legacy = "01/02/23 04:05:06"
+        stamp = utilities.parseTimestamp(legacy)
+        assert isinstance(stamp, float)
+        assert utilities.formatTimestamp(stamp) == legacy
+        assert utilities.parseTimestamp(stamp) == stamp
+        assert utilities.formatTimestamp(legacy) == legacy
+
+    def test_RelativeTime(self):
+        assert utilities.relativeTime(100, 100) == ""
+        assert utilities.relativeTime(100, 145) == "45 seconds ago"
+        assert utilities.relativeTime(0, 119) == "119 seconds ago"
+        assert utilities.relativeTime(0, 120) == "2 minutes ago"
+        assert utilities.relativeTime(0, 7199) == "119 minutes ago"
+        assert utilities.relativeTime(0, 7200) == "2 hours ago"
+        assert utilities.relativeTime(0, 86399) == "23 hours ago"
+        assert utilities.relativeTime(0, 86400) == "1 days ago"
+
+    def test_SystemDates(self):
+        sys = System()
+        assert isinstance(sys.created, float) and isinstance(sys.updated, float)
+        assert utilities.parseTimestamp(sys.createDate) == int(sys.created)
+        assert 0 <= sys.deltaSinceUpdate() < 5
+
+        sys.updateDate = utilities.formatTimestamp(sys.updated - 3600)
+        assert isinstance(sys.updated, float)
+        assert 3595 < sys.deltaSinceUpdate() < 3605
+
 class TestSystem:
     def test_Search(self):
         e = random.choice([RequirementElement(testSys) for x in range(10)])
         assert e == testSys.searchByUUID(str(e.uuid))
 
+    def test_SearchIndex(self):
+        sys = System()
+        r = RequirementElement(sys)
+        d = DesignElement(sys)
+        t = TestElement(sys)
+
+        assert t in sys.TE and t not in sys.RL
+        for e in [r, d, t]:
+            assert sys.searchByUUID(e.uuid) is e
+            assert sys.searchByUUID(str(e.uuid)) is e
+        assert sys.searchByUUID(uuid4()) is None
+
+        loaded = System.fromDict(sys.toDict())
+        assert loaded.searchByUUID(r.uuid) in loaded.RL
+
     def test_Serialize(self):
         assert System.fromDict(testSys.toDict()) == testSys
 
+    def test_ContentHash(self):
+        sys = System()
+        r = RequirementElement(sys)
+        loaded = System.fromDict(sys.toDict())
+        assert loaded == sys and loaded.contentHash() == sys.contentHash()
+        assert Datatypes.systems.get(sys.uuid) is loaded
+
+        digest = sys.contentHash()
+        r.public = {"Name": "changed"}
+        assert sys.contentHash() != digest and loaded != sys
+        loaded.searchByUUID(r.uuid).public = {"Name": "changed"}
+        loaded.__dict__['_updated'] = sys._updated
+        assert loaded == sys
+
+    def test_CreateRequirements(self):
+        sys = System()
+        delivered = []
+        sys.subscribe(delivered.append)
+        version = sys.version
+
+        rows = [{"Name": "req{}".format(x)} for x in range(100)] + [None]
+        created = sys.createRequirements(rows)
+        sys.flush()
+
+        assert sys.RL == created and len({e.uuid for e in created}) == 101
+        assert sys.version == version + 1 and len(delivered) == 1
+        assert list(delivered[0].added) == [str(e.uuid) for e in created]
+        assert {e.updateDate for e in created} == {sys.updateDate}
+        assert created[3].public == {"Name": "req3", "Requirement": "", "Rationale": "", "Metric": ""}
+        assert created[-1].public["Name"] == "" and sys.searchByUUID(created[-1].uuid) is created[-1]
+        assert System.fromStr(json.dumps(sys.toDict())) == sys
+
+        RequirementElement.random(sys)
+        assert len(sys.RL) == 102
+
+    def test_Changes(self):
+        sys = System()
+        kept = RequirementElement(sys)
+        delivered = []
+        sys.subscribe(delivered.append)
+
+        with sys.transaction():
+            added = [RequirementElement(sys) for x in range(100)]
+            added[0].public = {"Name": "renamed"}
+            kept.public = {"Name": "renamed"}
+            sys.removeElement(added[1])
+            assert delivered == []
+
+        assert len(delivered) == 1
+        changes = delivered[0]
+        assert list(changes.added) == [str(e.uuid) for e in added if e is not added[1]]
+        assert list(changes.modified) == [str(kept.uuid)]
+        assert len(changes.removed) == 0
+        assert sys.searchByUUID(added[1].uuid) is None
+
+        sys.removeElement(kept)
+        assert list(delivered[1].get(Datatypes.ChangeKind.REMOVED)) == [str(kept.uuid)]
+        assert kept not in sys.RL
+
+class TestCache:
+
+    def savedSystem(self, name):
+        sys = System()
+        sys.setName(name)
+        [RequirementElement(sys) for x in range(10)]
+        sys.save(os.path.join(tmpdir, "{}.json".format(sys.uuid)))
+        return sys
+
+    def test_UnloadData(self):
+        sys = self.savedSystem("paged")
+        saved = sys.toDict(detached=True)
+        sys.RL[0].public = {"Name": "kept"}
+        assert not sys.unloadData()
+
+        sys.save(sys._basePath)
+        assert sys.unloadData()
+        assert 'RL' not in sys.__dict__ and sys.footprint() == 0
+        assert sys.RL[0].public == {"Name": "kept"} and sys.RL[0].owningSystem is sys
+        assert sys.searchByUUID(sys.RL[1].uuid) is sys.RL[1]
+        assert len(sys.RL) == len(saved['RequirementElements'])
+
+    def test_Eviction(self):
+        cache = SystemCache(budget = 0)
+        opened, closed, unsaved = self.savedSystem("opened"), self.savedSystem("closed"), self.savedSystem("unsaved")
+        RequirementElement(unsaved)
+        class View: pass
+        view = View()
+        cache.pin(opened, view)
+        cache.add(closed)
+        cache.add(unsaved)
+        created = System()
+        cache.add(created)
+
+        assert cache.get(opened.uuid) is opened and 'RL' in opened.__dict__
+        assert 'RL' in unsaved.__dict__ and 'RL' not in closed.__dict__
+        assert str(closed.uuid) not in cache.recent
+        # Held by whoever made it until it has a file to page out to
+        assert cache.get(created.uuid) is created and str(created.uuid) not in cache.recent
+
+        del view
+        cache.add(self.savedSystem("later"))
+        assert 'RL' not in opened.__dict__
+
+        # A system whose file is gone cannot be paged out and is kept
+        missing = self.savedSystem("missing")
+        cache.add(missing)
+        os.remove(missing._basePath)
+        cache.add(self.savedSystem("latest"))
+        assert 'RL' in missing.__dict__ and str(missing.uuid) in cache.recent
+
 class TestSerialization:
     def test_SaveLoad(self):
 
@@ -156,6 +446,180 @@ class TestSerialization:
         os.remove(autosave)
         os.remove(manualsave)
 
+    def test_Dirty(self):
+        sys = System()
+        assert not sys.isDirty()
+        rl = RequirementElement(sys)
+        assert sys.isDirty()
+
+        path = sys.save("{}/{}.json".format(tmpdir, str(sys.uuid)))
+        assert not sys.isDirty()
+        rl.public = {"test": "changed"}
+        assert sys.isDirty()
+        assert not System.loadFromFile(path).isDirty()
+
+        os.remove(path)
+
+    def test_BackgroundSave(self):
+        sys = System()
+        [RequirementElement(sys) for x in range(50)]
+        path = "{}/{}.json".format(tmpdir, str(sys.uuid))
+
+        assert sys.saveInBackground(path) == path
+        expected = sys.toDict(detached=True)
+        RequirementElement(sys)
+        assert storage.waitForSaves(10000)
+
+        with open(path) as fp:
+            assert fp.read() == json.dumps(expected)
+        assert sys.isDirty()
+
+        os.remove(path)
+
+    def test_Journal(self):
+        configuration.savemode = 'Journal'
+        sys = System()
+        rls = [RequirementElement(sys) for x in range(200)]
+        path = "{}/{}.json".format(tmpdir, str(sys.uuid))
+        sys.save(path)
+        basesize = os.path.getsize(path)
+
+        rls[0].public = {"Name" : "edited"}
+        sys.removeElement(rls[1])
+        RequirementElement(sys)
+        sys.setName("Journaled")
+        sys.save(path)
+
+        assert os.path.getsize(path) == basesize
+        assert os.path.getsize(storage.journalPath(path)) < 2000
+        assert System.loadFromFile(path) == sys
+        assert System.getDummySystemFromFile(path).name == "Journaled"
+
+        # A batch cut short by a crash is ignored
+        with open(storage.journalPath(path), 'a') as fp:
+            fp.write(storage.JOURNALBEGIN + '\n{"uuid": "' + str(rls[2].uuid) + '", "removed": tr')
+        assert System.loadFromFile(path) == sys
+
+        rls[3].public = {"Name" : "after crash"}
+        sys.save(path)
+        assert System.loadFromFile(path) == sys
+
+        sys.compact(path)
+        assert storage.waitForSaves(10000)
+        assert not os.path.exists(storage.journalPath(path))
+        assert not storage.rotatedJournals(path)
+        assert System.loadFromFile(path) == sys
+
+        configuration.savemode = 'Full'
+        os.remove(path)
+
+    def test_JournalOrder(self):
+        configuration.savemode = 'Journal'
+        sys = System()
+        base = RequirementElement(sys)
+        path = sys.save("{}/{}.json".format(tmpdir, str(sys.uuid)))
+
+        a = RequirementElement(sys)
+        b = RequirementElement(sys)
+        sys.save(path)
+        # Editing a in a later batch keeps it ahead of b
+        a.public = {"Name" : "edited"}
+        sys.save(path)
+
+        loaded = System.loadFromFile(path)
+        assert [rl.uuid for rl in loaded.RL] == [base.uuid, a.uuid, b.uuid]
+        assert loaded == sys
+
+        # Removed and added back before the next save, a now sits at the end
+        sys.removeElement(a)
+        sys.addRequirement(a)
+        sys.save(path)
+        loaded = System.loadFromFile(path)
+        assert [rl.uuid for rl in loaded.RL] == [base.uuid, b.uuid, a.uuid]
+        assert loaded == sys
+
+        configuration.savemode = 'Full'
+        os.remove(path)
+
+    def test_InPlaceEdits(self):
+        for mode in ('Full', 'Journal'):
+            configuration.savemode = mode
+            sys = System()
+            r = RequirementElement(sys)
+            path = sys.save("{}/{}.json".format(tmpdir, str(sys.uuid)))
+
+            # Changed through the container without a touch
+            for name in ('first', 'second'):
+                r.public['Name'] = name
+                sys.save(path)
+                loaded = System.loadFromFile(path)
+                assert loaded.RL[0].public['Name'] == name
+                assert loaded == sys and not sys.isDirty()
+
+            configuration.savemode = 'Full'
+            os.remove(path)
+
+    def test_Header(self):
+        sys = System()
+        [RequirementElement(sys) for x in range(20)]
+        path = sys.save("{}/{}.json".format(tmpdir, str(sys.uuid)))
+
+        header = storage.readHeader(path)
+        assert header == {key : sys.toDict()[key] for key in storage.HEADERKEYS}
+        dummy = System.getDummySystemFromFile(path)
+        assert (dummy.uuid, dummy.name, dummy.updateDate) == (sys.uuid, sys.name, sys.updateDate)
+        assert dummy.RL == []
+
+        # Files that put the elements first are read in full instead
+        d = sys.toDict()
+        with open(path, 'w') as fp:
+            json.dump({key : d[key] for key in reversed(d)}, fp)
+        assert storage.readHeader(path) is None
+        assert System.getDummySystemFromFile(path).name == sys.name
+
+        os.remove(path)
+
+    def test_AtomicWrite(self):
+        path = "{}/{}.json".format(tmpdir, str(uuid4()))
+        storage.writeAtomic(path, {"name" : "original", "items" : [1, 2]})
+
+        with pytest.raises(TypeError):
+            storage.writeAtomic(path, {"name" : "broken", "items" : [1, object()]})
+
+        assert json.load(open(path)) == {"name" : "original", "items" : [1, 2]}
+        assert not [f for f in os.listdir(tmpdir) if f.endswith('.tmp')]
+
+        # New files get the mode the umask allows, replaced files keep theirs
+        assert os.stat(path).st_mode & 0o777 == 0o666 & ~storage.UMASK
+        os.chmod(path, 0o640)
+        storage.writeAtomic(path, {"name" : "replaced"})
+        assert os.stat(path).st_mode & 0o777 == 0o640
+
+        os.remove(path)
+
+    def test_Detached(self):
+        rl = RequirementElement(testSys)
+
+        assert rl.toDict()['public'] is rl.public
+        assert rl.toDict(detached=True)['public'] is not rl.public
+        assert rl.toDict(detached=True) == rl.toDict()
+        assert testSys.toDict(detached=True) == testSys.toDict()
+
+    def test_SinglePassLoad(self):
+        sys = System()
+        [RequirementElement(sys) for x in range(5)]
+        [DesignElement(sys) for x in range(5)]
+        [TestElement(sys) for x in range(5)]
+
+        loaded = System.fromStr(json.dumps(sys.toDict()))
+
+        assert loaded == sys
+        assert len(loaded.RL) == len(sys.RL)
+        assert all(type(rl) is RequirementElement and rl.owningSystem is loaded for rl in loaded.RL)
+        assert all(type(dl) is DesignElement for dl in loaded.DL)
+        assert all(type(te) is TestElement for te in loaded.TE)
+        assert loaded.updateDate == sys.updateDate
+
 
 class TestColors:
     def test_AutoDetect(self):
@@ -0,0 +1,102 @@
+import os
+import shutil
+import pytest
+from uuid import uuid4
+from PySide6.QtWidgets import QApplication
+from BlackBoxr.mainwindow.dashboard.home import Dashboard, renameSystem
+from BlackBoxr.misc import Datatypes, objects
+from BlackBoxr.misc.Datatypes import RequirementElement, System
+from BlackBoxr.misc.catalog import Catalog, catalog
+from BlackBoxr.misc.objects import tmpdir
+
+@pytest.fixture
+def workspace():
+    path = os.path.join(tmpdir, str(uuid4()))
+    os.makedirs(path)
+    yield path
+    shutil.rmtree(path)
+
+def saveSystem(workspace, name):
+    sys = System()
+    sys.setName(name)
+    RequirementElement(sys)
+    return sys, sys.save(os.path.join(workspace, "{}.json".format(sys.uuid)))
+
+class TestCatalog:
+
+    def test_Refresh(self, workspace):
+        catalog = Catalog(os.path.join(workspace, 'catalog.sqlite3'))
+        sysA, pathA = saveSystem(workspace, "Alpha")
+        sysB, pathB = saveSystem(workspace, "Beta")
+
+        assert catalog.refresh([workspace])
+        assert not catalog.refresh([workspace])
+        assert catalog.pathForUUID(sysA.uuid) == os.path.normpath(pathA)
+        entry = [e for e in catalog.entries() if e.uuid == str(sysB.uuid)][0]
+        assert (entry.name, entry.updateDate, entry.size) == ("Beta", sysB.updateDate, os.path.getsize(pathB))
+
+        os.remove(pathA)
+        assert catalog.refresh([workspace])
+        assert catalog.pathForUUID(sysA.uuid) is None
+        catalog.close()
+
+    def test_UpdateFile(self, workspace):
+        catalog = Catalog(os.path.join(workspace, 'catalog.sqlite3'))
+        sys, path = saveSystem(workspace, "Before")
+        assert catalog.updateFile(path)
+
+        sys.setName("After")
+        RequirementElement(sys)
+        sys.save(path)
+        assert catalog.updateFile(path)
+        assert [e.name for e in catalog.entries()] == ["After"]
+        assert catalog.search("Before") == []
+        catalog.close()
+
+    def test_Search(self, workspace):
+        catalog = Catalog(os.path.join(workspace, 'catalog.sqlite3'))
+        for name in ["Braking System", "Steering", "Brake_Lights", "Power Steering"]:
+            catalog.updateFile(saveSystem(workspace, name)[1])
+
+        assert [e.name for e in catalog.search("steer")] == ["Steering", "Power Steering"]
+        assert [e.name for e in catalog.search("bra")] == ["Brake_Lights", "Braking System"]
+        assert [e.name for e in catalog.search("e_l")] == ["Brake_Lights"]
+        assert [e.name for e in catalog.search("%")] == []
+        assert len(catalog.search("")) == 4
+        catalog.close()
+
+    def test_RenameKeepsResident(self, workspace):
+        resident, path = saveSystem(workspace, "Before")
+        catalog().updateFile(path)
+        unsaved = RequirementElement(resident)
+
+        renameSystem(System.fromHeader(catalog().entry(path)._asdict()), "After")
+
+        assert objects.systems.get(resident.uuid) is resident
+        assert unsaved in resident.RL
+        assert resident.name == "After"
+        assert System.loadFromFile(path).name == "After"
+        catalog().removeFile(os.path.normpath(path))
+
+class TestDashboard:
+
+    def test_CreateRenameRescan(self, workspace, monkeypatch):
+        app = QApplication.instance() or QApplication([])
+        monkeypatch.setattr(objects, 'searchdirs', [workspace])
+        monkeypatch.setattr(Datatypes, 'datadir', workspace)
+        dashboard = Dashboard()
+        dashboard.threadpool.waitForDone()
+        app.processEvents()
+
+        dashboard.pushButton.click()
+        dashboard.model.setData(dashboard.model.index(0), "Created")
+        dashboard.rescanDirs.add(os.path.normpath(os.path.abspath(workspace)))
+        dashboard.rescan()
+        dashboard.threadpool.waitForDone()
+        app.processEvents()
+
+        assert dashboard.model.rowCount() == 1
+        assert dashboard.model.index(0).data() == "Created"
+        for path in dashboard.cards:
+            catalog().removeFile(path)
+        dashboard.deleteLater()